@@ -1,65 +1,186 @@
 # Data cleaning pipeline available as a script
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.feather as feather
 from unidecode import unidecode
 
 
-def clean():
-    # Load data
-    df_main_raw = pd.read_parquet("data/properties_main.parquet", engine="pyarrow", dtype_backend="numpy_nullable")
-
-    # Split locality data
-    df_main = df_main_raw.copy()
-    df_main["city"] = df_main_raw["locality"].apply(lambda row: row.split(",")[1])
-    df_main["neighborhood"] = df_main_raw["locality"].apply(lambda row: unidecode(row.split(",")[0]).upper().strip())
-    df_main = df_main.drop(columns=["locality"])
-
-    # Filter sao carlos properties
-    sao_carlos = df_main[df_main["city"] == "São Carlos"]
-
-    # Column selection
-    selected = (sao_carlos
-    .drop(columns=[
-        "property_reference",
-        "title",
-        'description',
-        'postal_code',
-        'address',
-        'latitude',
-        'longitude',  # A more complex model may use it to calculate distance to uptown, will not be used at first
-        'city',
-        'neighborhood',  # Using neighborhoods may introduce too much sparsity in the model (over 200 neighborhoods)
-        'show_map',
-        'has_sale_price',
-        'has_rent_price',  # Already visible by NaNs
-        'image_count',
-        'publisher_code',
-        'publisher_name',
-        'publisher_phone',
-        'price_per_sqm_rent',
-        'price_per_sqm_sale',
-        "has_gym" # No true values
-    ]))
-
-    # Select residencial properties
-    residencial_df = selected[selected['property_type'].isin(["Casa", "Apartamento"])]
-
-    # Based on the EDA notebook, we shall remove nonsense outliers from the area_util column
-    residencial_df = residencial_df[residencial_df['area_util'] > 10]
-
-
-    # Cleaning null values
-    clean_data = residencial_df.copy()
-    clean_data = clean_data.dropna(
-        subset=['bathrooms', 'bedrooms', 'area_total', 'area_util', 'size_category', 'parking_spaces'])
+# Partitioned main table written by parser/export_parquet.py
+MAIN_DATASET = "data/properties_main"
+
+# Default selection: Sao Carlos residencial properties
+DEFAULT_CITIES = ("São Carlos",)
+DEFAULT_PROPERTY_TYPES = ("Casa", "Apartamento")
+
+# Rows missing any of these are misinputs or comercial rooms (see data_cleaning.ipynb)
+REQUIRED_COLUMNS = ["bathrooms", "bedrooms", "area_total", "area_util", "size_category", "parking_spaces"]
+
+# Columns of the main table kept for modelling, in table order.
+# Dropped columns (title, address, coordinates, neighborhood, publisher, ...) are never loaded:
+# neighborhoods would introduce too much sparsity (over 200) and has_gym has no true values.
+# suites, property_tax and total_monthly_cost mix misinputs and systematic missing values
+MODEL_COLUMNS = [
+    "property_code",
+    "property_type",
+    "property_subtype",
+    "sale_price",
+    "rent_price",
+    "bedrooms",
+    "bathrooms",
+    "parking_spaces",
+    "area_util",
+    "area_total",
+    "condominium_fee",
+    "has_pool",
+    "has_bbq",
+    "has_playground",
+    "has_sauna",
+    "has_party_room",
+    "has_sports_court",
+    "has_24h_security",
+    "has_laundry",
+    "has_closet",
+    "has_office",
+    "has_pantry",
+    "size_category",
+    "amenity_score",
+]
+
+# Cleaned datasets, stored as uncompressed Arrow IPC (Feather v2) so Arrow readers can
+# memory-map them without copying and pandas readers get the exact dtypes back
+CLEAN_DATA_FILES = {
+    "sell": "data/clean_data_sell.arrow",
+    "rent": "data/clean_data_rent.arrow",
+}
+
+
+def save_clean_data(df: pd.DataFrame, kind: str):
+    """Write a cleaned dataset ("sell" or "rent") as Arrow IPC, keeping its pandas dtypes"""
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    # Compression would force a copy on read, so the file is left uncompressed
+    feather.write_feather(table, CLEAN_DATA_FILES[kind], compression="uncompressed")
+
+
+def load_clean_table(kind: str = "sell") -> pa.Table:
+    """Cleaned dataset ("sell" or "rent") as an Arrow table memory-mapped from disk (zero copy)"""
+    with pa.memory_map(CLEAN_DATA_FILES[kind]) as source:
+        return pa.ipc.open_file(source).read_all()
+
+
+def load_clean_data(kind: str = "sell") -> pd.DataFrame:
+    """
+    Cleaned dataset ("sell" or "rent") as a DataFrame with nullable dtypes and categories
+
+    This is a copy: pandas nullable columns own their values and masks, so each column is
+    converted onto the heap. The conversion releases the memory-mapped buffers column by
+    column and skips block consolidation; use load_clean_table to read without copying.
+    """
+    return load_clean_table(kind).to_pandas(split_blocks=True, self_destruct=True)
+
+
+def _fold(text: str) -> str:
+    """Accent and case insensitive form of a name ('São Carlos' -> 'SAO CARLOS')"""
+    return unidecode(text).upper().strip()
+
+
+def _partition_values(dataset_dir: str, column: str, wanted) -> list[str]:
+    """
+    Partition values of column that match any of the wanted names, ignoring accents and case
+
+    Only the partition dictionary is folded (a handful of names), never the rows.
+    """
+    dataset = ds.dataset(dataset_dir, format="parquet",
+                         partitioning=ds.HivePartitioning.discover(infer_dictionary=True))
+    index = dataset.partitioning.schema.names.index(column)
+    wanted = {_fold(name) for name in wanted}
+    return [value for value in dataset.partitioning.dictionaries[index].to_pylist() if _fold(value) in wanted]
+
+
+def load_model_data(cities=DEFAULT_CITIES, property_types=DEFAULT_PROPERTY_TYPES,
+                    dataset_dir: str = MAIN_DATASET) -> pd.DataFrame:
+    """
+    Read the properties used by the models, with every row filter pushed into the Parquet scan
+
+    Partitions outside the cities/property types are pruned, row groups are skipped using
+    their statistics, and only MODEL_COLUMNS are materialized.
+    """
+    row_filter = (
+        pc.field("city").isin(_partition_values(dataset_dir, "city", cities))
+        & pc.field("property_type").isin(_partition_values(dataset_dir, "property_type", property_types))
+        # Based on the EDA notebook, we shall remove nonsense outliers from the area_util column
+        & (pc.field("area_util") > 10)
+    )
+    for column in REQUIRED_COLUMNS:
+        row_filter &= pc.field(column).is_valid()
+
+    df = pd.read_parquet(
+        dataset_dir,
+        engine="pyarrow",
+        dtype_backend="numpy_nullable",
+        columns=MODEL_COLUMNS,
+        filters=row_filter,
+    )
+    # Partition and dictionary columns come back with every value of the dataset as a category
+    # (filtered out property types included); keep only the values present, sorted, as the
+    # CSV pipeline did, so category codes do not depend on which partitions exist on disk
+    categorical = df.select_dtypes(include="category").columns
+    return df.assign(**{column: df[column].astype(object).astype("category") for column in categorical})
+
+
+def to_numpy_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Copy of df with nullable columns turned into plain NumPy ones (bool, int64, float64)
+
+    patsy/statsmodels formulas do not understand pandas nullable dtypes. Integer columns
+    with missing values become float64.
+    """
+    converted = {}
+    for column, dtype in df.dtypes.items():
+        if isinstance(dtype, pd.BooleanDtype) and not df[column].hasnans:
+            converted[column] = df[column].to_numpy(dtype=bool)
+        elif isinstance(dtype, pd.BooleanDtype):
+            converted[column] = df[column].astype(object)
+        elif isinstance(dtype, pd.api.extensions.ExtensionDtype) and pd.api.types.is_integer_dtype(dtype):
+            converted[column] = df[column].to_numpy(dtype="float64" if df[column].hasnans else "int64", na_value=np.nan)
+        elif isinstance(dtype, pd.api.extensions.ExtensionDtype) and pd.api.types.is_float_dtype(dtype):
+            converted[column] = df[column].to_numpy(dtype="float64", na_value=np.nan)
+    return df.assign(**converted)
+
+
+def clean(cities=DEFAULT_CITIES, property_types=DEFAULT_PROPERTY_TYPES, csv: bool = False):
+    """
+    Build the sell and rent datasets for the given cities and property types
+
+    Names are matched ignoring accents and case, so "Sao Carlos" selects "São Carlos".
+    """
+    clean_data = load_model_data(cities, property_types)
+    # Houses without condominium have no fee
     clean_data["condominium_fee"] = clean_data["condominium_fee"].fillna(0)
-    clean_data = clean_data.drop(columns=['total_monthly_cost', 'suites', 'property_tax'])
-    clean_data_sell = clean_data[~clean_data["sale_price"].isnull()].drop(columns=["rent_price"])
-    clean_data_rent = clean_data[~clean_data["rent_price"].isnull()].drop(columns=["sale_price"])
 
+    clean_data_sell = clean_data.loc[clean_data["sale_price"].notna(), clean_data.columns.drop("rent_price")]
+    clean_data_rent = clean_data.loc[clean_data["rent_price"].notna(), clean_data.columns.drop("sale_price")]
+
+    save_clean_data(clean_data_sell, "sell")
+    save_clean_data(clean_data_rent, "rent")
+
+    # CSV copies are only written on request (they lose the dtypes)
+    if csv:
+        clean_data_rent.to_csv("data/clean_data_rent.csv", index=False)
+        clean_data_sell.to_csv("data/clean_data_sell.csv", index=False)
 
-    # save to csv
-    clean_data_rent.to_csv("data/clean_data_rent.csv", index=False)
-    clean_data_sell.to_csv("data/clean_data_sell.csv", index=False)
 
 if __name__ == "__main__":
-    clean()
\ No newline at end of file
+    import argparse
+
+    arg_parser = argparse.ArgumentParser(description="Clean the exported Roca data for modelling")
+    arg_parser.add_argument("--city", action="append", dest="cities",
+                            help="City to keep (repeatable, default: São Carlos)")
+    arg_parser.add_argument("--property-type", action="append", dest="property_types",
+                            help="Property type to keep (repeatable, default: Casa and Apartamento)")
+    arg_parser.add_argument("--csv", action="store_true", help="Also write CSV copies")
+    args = arg_parser.parse_args()
+
+    clean(args.cities or DEFAULT_CITIES, args.property_types or DEFAULT_PROPERTY_TYPES, args.csv)
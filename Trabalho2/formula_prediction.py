@@ -0,0 +1,141 @@
+# Predictions of the formula (OLS/GLM) models from design matrices built without patsy
+import re
+
+import numpy as np
+import pandas as pd
+
+
+# Factors the builder understands: a plain variable or C(variable)
+_FACTOR_PATTERN = re.compile(r"^(?:C\((\w+)\)|(\w+))$")
+
+# Up to this many rows, categorical levels are looked up in a dict (pandas indexing has a
+# fixed cost that dominates single-record predictions)
+_SMALL_FRAME = 64
+
+
+class DesignMatrixBuilder:
+    """
+    Design matrix of a fitted formula model, built straight from a DataFrame
+
+    Compiled once from the patsy design info saved with the results: every column is the
+    intercept, a numeric variable or the contrast rows of a categorical variable's levels,
+    so building a matrix is a few array lookups instead of parsing and evaluating the formula.
+    Only main effects of plain variables and C(variable) are supported.
+    """
+
+    def __init__(self, design_info):
+        self.column_names = list(design_info.column_names)
+        # (variable, levels, contrast matrix) per block of columns; variable None is the intercept,
+        # levels None a numeric variable
+        self._blocks = []
+        for term, subterms in design_info.term_codings.items():
+            for subterm in subterms:
+                if not subterm.factors:
+                    self._blocks.append((None, None, None))
+                    continue
+                if len(subterm.factors) > 1:
+                    raise ValueError(f"Interaction terms are not supported: {term.name()}")
+                factor = subterm.factors[0]
+                match = _FACTOR_PATTERN.match(factor.code.replace(" ", ""))
+                if match is None:
+                    raise ValueError(f"Unsupported formula factor: {factor.code}")
+                variable = match.group(1) or match.group(2)
+                info = design_info.factor_infos[factor]
+                if info.type == "numerical":
+                    if info.num_columns != 1:
+                        raise ValueError(f"Multi-column factor not supported: {factor.code}")
+                    self._blocks.append((variable, None, None))
+                else:
+                    self._blocks.append((variable, pd.Index(info.categories),
+                                         subterm.contrast_matrices[factor].matrix))
+        self._codes = {variable: {level: code for code, level in enumerate(levels)}
+                       for variable, levels, _ in self._blocks if levels is not None}
+
+    @property
+    def variables(self) -> list[str]:
+        """Columns of the input frames used by the design matrix"""
+        return [variable for variable, _, _ in self._blocks if variable is not None]
+
+    @classmethod
+    def from_results(cls, results) -> "DesignMatrixBuilder":
+        return cls(results.model.data.design_info)
+
+    def build(self, df: pd.DataFrame) -> np.ndarray:
+        """Design matrix (rows of df x model columns) as a float array"""
+        blocks = []
+        for variable, levels, contrast in self._blocks:
+            if variable is None:
+                blocks.append(np.ones((len(df), 1)))
+            elif levels is None:
+                blocks.append(np.asarray(df[variable], dtype=float).reshape(-1, 1))
+            else:
+                values = df[variable]
+                if len(df) <= _SMALL_FRAME:
+                    codes = np.array([self._codes[variable].get(value, -1) for value in values], dtype=np.intp)
+                else:
+                    codes = levels.get_indexer(values)
+                if (codes < 0).any():
+                    unknown = sorted(set(values[codes < 0].astype(str)))
+                    raise ValueError(f"Unknown levels of {variable}: {unknown}")
+                blocks.append(contrast[codes])
+        return np.hstack(blocks)
+
+
+class FormulaPredictor:
+    """
+    Replacement for results.get_prediction(df).summary_frame(alpha) of OLS and GLM results
+
+    The design matrix builder, coefficients and covariance are taken once from the results;
+    each prediction is then X @ params with standard errors from the same X and covariance.
+    """
+
+    def __init__(self, results):
+        self.design = DesignMatrixBuilder.from_results(results)
+        self.params = np.asarray(results.params, dtype=float)
+        self.cov = np.asarray(results.cov_params(), dtype=float)
+        self.scale = float(results.scale)
+        self.use_t = bool(results.use_t)
+        self.df_resid = float(results.df_resid)
+        # GLMs report the mean through the inverse link; linear models also get obs intervals
+        family = getattr(results.model, "family", None)
+        self.link = family.link if family is not None else None
+        self._critical_values = {}
+
+    def critical_value(self, alpha: float) -> float:
+        """Two-sided t (or normal) quantile of the intervals, cached per alpha"""
+        if alpha not in self._critical_values:
+            from scipy import stats
+
+            dist = stats.t(self.df_resid) if self.use_t else stats.norm
+            self._critical_values[alpha] = float(dist.ppf(1 - alpha / 2))
+        return self._critical_values[alpha]
+
+    def summary_frame(self, df: pd.DataFrame, alpha: float = 0.05) -> pd.DataFrame:
+        """
+        Same columns as statsmodels' summary_frame: mean, mean_se, mean_ci_lower, mean_ci_upper,
+        plus obs_ci_lower, obs_ci_upper for linear models
+        """
+        X = self.design.build(df)
+        linpred = X @ self.params
+        se = np.sqrt(np.einsum("ij,jk,ik->i", X, self.cov, X))
+        q = self.critical_value(alpha)
+
+        if self.link is not None:
+            lower = self.link.inverse(linpred - q * se)
+            upper = self.link.inverse(linpred + q * se)
+            return pd.DataFrame({
+                'mean': self.link.inverse(linpred),
+                'mean_se': se * np.abs(self.link.inverse_deriv(linpred)),
+                'mean_ci_lower': np.minimum(lower, upper),
+                'mean_ci_upper': np.maximum(lower, upper),
+            }, index=df.index)
+
+        obs_se = np.sqrt(se ** 2 + self.scale)
+        return pd.DataFrame({
+            'mean': linpred,
+            'mean_se': se,
+            'mean_ci_lower': linpred - q * se,
+            'mean_ci_upper': linpred + q * se,
+            'obs_ci_lower': linpred - q * obs_se,
+            'obs_ci_upper': linpred + q * obs_se,
+        }, index=df.index)
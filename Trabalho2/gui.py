@@ -1,6 +1,6 @@
 import streamlit as st
 import pandas as pd
-from model_interface import ModelInterface
+from model_interface import LiveModelInterface
 
 
 st.set_page_config(page_title="Predição Imobiliária", layout="wide")
@@ -27,11 +27,22 @@ st.write("Insira abaixo os dados do imóvel para obter estimativas de preço de
 
 @st.cache_resource
 def load_api():
-    return ModelInterface()
+    # Follows models/manifest.json, so retrained models are picked up without a restart
+    return LiveModelInterface()
 
 api = load_api()
 
 
+TOP_CONTRIBUTIONS = 5
+
+def show_contributions(contributions: pd.Series, scale: float = 1.0):
+    """Features that moved the XGBoost estimate the most (TreeSHAP, in reais)"""
+    top = contributions.drop("bias").sort_values(key=abs, ascending=False).head(TOP_CONTRIBUTIONS)
+    st.write("**Principais fatores:**")
+    for feature, value in top.items():
+        st.write(f"{'🔺' if value > 0 else '🔻'} {feature}: {'+' if value > 0 else '-'}R${abs(value) * scale:,.2f}")
+
+
 
 st.header("📋 Preencha os dados do imóvel")
 
@@ -127,20 +138,30 @@ if predict_button:
 
         with c2:
             st.subheader("📙 GLM Gamma")
-            g = float(result["glm"]["mean"]) * 10000
-            g_up = float(result["glm"]["mean_ci_upper"]) * 10000
-            g_low = float(result["glm"]["mean_ci_lower"]) * 10000
+            g = float(result["glm"]["mean"]) * 100000
+            g_up = float(result["glm"]["mean_ci_upper"]) * 100000
+            g_low = float(result["glm"]["mean_ci_lower"]) * 100000
             st.write(f"**Preço estimado:** R${g:,.2f}")
             st.write(f"Alta: R${g_up:,.2f}")
             st.write(f"Baixa: R${g_low:,.2f}")
 
         with c3:
             st.subheader("📗 XGBoost")
-            xp = float(result["xgb"][0]) * 100000
+            xp = float(result["xgb"]["mean"].iloc[0]) * 100000
+            xp_up = float(result["xgb"]["obs_ci_upper"].iloc[0]) * 100000
+            xp_low = float(result["xgb"]["obs_ci_lower"].iloc[0]) * 100000
             st.write(f"**Preço estimado:** R${xp:,.2f}")
+            st.write(f"Alta: R${xp_up:,.2f}")
+            st.write(f"Baixa: R${xp_low:,.2f}")
+            show_contributions(api.explain(record, "sale").iloc[0], 100000)
     else:
-        rent_pred = api.predict_rent(record)
+        rent_pred = api.predict_rent_interval(record)
         st.markdown("<h2>📊 Resultado da Predição de Aluguel</h2>", unsafe_allow_html=True)
         st.subheader("🏢 XGBoost - Aluguel")
-        rent_price = float(rent_pred[0])
+        rent_price = float(rent_pred["mean"].iloc[0])
+        rent_up = float(rent_pred["obs_ci_upper"].iloc[0])
+        rent_low = float(rent_pred["obs_ci_lower"].iloc[0])
         st.write(f"**Aluguel estimado:** R${rent_price:,.2f}")
+        st.write(f"Alta: R${rent_up:,.2f}")
+        st.write(f"Baixa: R${rent_low:,.2f}")
+        show_contributions(api.explain(record, "rent").iloc[0])
@@ -1,9 +1,215 @@
-# Full pipeline should be implemented in this file
+# Full pipeline: XML parse/export -> cleaning -> model fitting -> model artifacts
+import os
+import shutil
+import sys
+
 import clean_data
+from pipeline import BUILD_DIR, Pipeline, Stage
+
+
+PARSER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "parser")
+PARSER_CODE = ["parser/parse_roca.py", "parser/export_parquet.py", "parser/aggregators.py"]
+
+EXPORT_OUTPUTS = [
+    "data/properties_main.parquet",
+    "data/properties_main",
+    "data/properties_characteristics.parquet",
+    "data/properties_images.parquet",
+    "data/properties_prices.parquet",
+    "data/properties_ml_features.parquet",
+]
+
+# Where the fitted models are read from (model_interface.py)
+MODEL_ARTIFACTS = {
+    "standardization.json": "models/standardization.json",
+    "ols.pickle": "models/ols.pickle",
+    "gamma_identity.pickle": "models/gamma_identity.pickle",
+    "xgb_model.json": "models/xgb_model.json",
+    "xgb_model_rent.json": "xgb_model_rent.json",
+    "conformal_residuals.npz": "models/conformal_residuals.npz",
+}
+
+# Build file of every registry artifact (model_registry.RELEASE_ARTIFACTS)
+RELEASE_FILES = {
+    "ols": "ols.pickle",
+    "glm": "gamma_identity.pickle",
+    "xgb": "xgb_model.json",
+    "rent": "xgb_model_rent.json",
+    "standardization": "standardization.json",
+    "conformal": "conformal_residuals.npz",
+}
+
+
+def export_stage(xml_file: str):
+    """Parse the XML feed and export the Parquet tables (one streaming pass)"""
+    sys.path.insert(0, PARSER_DIR)
+    from parse_roca import RocaXMLParser
+    from export_parquet import RocaParquetExporter
+
+    RocaParquetExporter(RocaXMLParser(xml_file)).export_to_parquet("data")
+
+
+def clean_stage(cities: list, property_types: list):
+    clean_data.clean(cities, property_types)
+
+
+def standardization_stage():
+    import training
+
+    params = training.fit_standardization(clean_data.load_clean_data("sell"))
+    training.save_standardization(params, os.path.join(BUILD_DIR, "standardization.json"))
+
+
+def fit_ols_stage():
+    import training
+
+    train, _ = training.split(training.standardize(clean_data.load_clean_data("sell")))
+    training.slim_results(training.fit_ols(train), os.path.join(BUILD_DIR, "ols.pickle"))
+
+
+def fit_glm_stage():
+    import training
+
+    train, _ = training.split(training.standardize(clean_data.load_clean_data("sell")))
+    training.slim_results(training.fit_gamma(train), os.path.join(BUILD_DIR, "gamma_identity.pickle"))
+
+
+def fit_xgb_sale_stage():
+    import training
+
+    train, _ = training.split(training.standardize(clean_data.load_clean_data("sell")))
+    model = training.fit_xgb(*training.xgb_sale_features(train), training.XGB_SALE_PARAMS)
+    model.save_model(os.path.join(BUILD_DIR, "xgb_model.json"))
+
+
+def fit_xgb_rent_stage():
+    import training
+
+    train, _ = training.split(clean_data.load_clean_data("rent"))
+    model = training.fit_xgb(*training.xgb_rent_features(train), training.XGB_RENT_PARAMS)
+    model.save_model(os.path.join(BUILD_DIR, "xgb_model_rent.json"))
+
+
+def conformal_stage():
+    """Calibration residuals of the fitted XGBoost models on the held-out splits"""
+    import training
+    from xgboost import XGBRegressor
+
+    sale_model, rent_model = XGBRegressor(), XGBRegressor()
+    sale_model.load_model(os.path.join(BUILD_DIR, "xgb_model.json"))
+    rent_model.load_model(os.path.join(BUILD_DIR, "xgb_model_rent.json"))
+    residuals = training.fit_conformal(sale_model, rent_model, clean_data.load_clean_data("sell"),
+                                       clean_data.load_clean_data("rent"))
+    training.save_conformal(residuals, os.path.join(BUILD_DIR, "conformal_residuals.npz"))
+
+
+def evaluation_stage():
+    """
+    Features, scaler and test metrics of every model, for the registry manifest
+
+    Predictions go through ModelInterface over the build artifacts, from raw test records,
+    so the metrics describe the models exactly as they are served.
+    """
+    import json
+    import training
+    from model_interface import ModelInterface
+
+    api = ModelInterface(artifact_files={key: os.path.join(BUILD_DIR, name) for key, name in RELEASE_FILES.items()})
+    sell = clean_data.load_clean_data("sell")
+    _, sale_test = training.split(training.standardize(sell, api.standardization))
+    _, rent_test = training.split(clean_data.load_clean_data("rent"))
+
+    sale_predictions = api.get_predictions(sell.loc[sale_test.index])
+    features = {
+        'ols': api.ols_predictor.design.variables,
+        'glm': api.glm_predictor.design.variables,
+        'xgb': api.xgb_trees.feature_names,
+    }
+    models = {name: {
+        'features': features[name],
+        'scaler': "standardization",
+        'metrics': training.regression_metrics(sale_test["sale_price"], sale_predictions[name]["mean"]),
+    } for name in ("ols", "glm", "xgb")}
+    # The identity-link Gamma interval is undefined where the mean is not positive
+    models['glm']['metrics']['nan_intervals'] = int(sale_predictions["glm"]["obs_ci_lower"].isna().sum())
+    models['rent'] = {
+        'features': api.rent_trees.feature_names,
+        'scaler': None,
+        'metrics': training.regression_metrics(rent_test["rent_price"], api.predict_rent(rent_test)),
+    }
+    with open(os.path.join(BUILD_DIR, "models.json"), "w", encoding="utf-8") as f:
+        json.dump(models, f, indent=2)
+
+
+def artifacts_stage():
+    """Install the fitted models at the fixed paths"""
+    for name, path in MODEL_ARTIFACTS.items():
+        shutil.copy2(os.path.join(BUILD_DIR, name), path)
+
+
+def publish_build():
+    """
+    Publish the built models as a registry release
+
+    Runs after the pipeline on every run instead of as a cached stage: the manifest must only
+    change through model_registry, and republishing the same models is a no-op.
+    """
+    import json
+    from model_registry import publish_release
+
+    with open(os.path.join(BUILD_DIR, "models.json"), encoding="utf-8") as f:
+        models = json.load(f)
+    files = {key: os.path.join(BUILD_DIR, name) for key, name in RELEASE_FILES.items()}
+    print(f"✓ Published model release {publish_release(files, models)}")
+
+
+def build_pipeline(xml_file: str = "data/roca.xml", cities=clean_data.DEFAULT_CITIES,
+                   property_types=clean_data.DEFAULT_PROPERTY_TYPES) -> Pipeline:
+    fit_code = ["clean_data.py", "training.py"]
+    return Pipeline([
+        Stage("export", export_stage, EXPORT_OUTPUTS, code=PARSER_CODE, inputs=[xml_file],
+              params={"xml_file": xml_file}),
+        Stage("clean", clean_stage, ["data/clean_data_sell.arrow", "data/clean_data_rent.arrow"],
+              deps=["export"], code=["clean_data.py"],
+              params={"cities": list(cities), "property_types": list(property_types)}),
+        # The fits only depend on the cleaned data, so they run concurrently
+        Stage("standardization", standardization_stage, [os.path.join(BUILD_DIR, "standardization.json")],
+              deps=["clean"], code=fit_code),
+        Stage("fit_ols", fit_ols_stage, [os.path.join(BUILD_DIR, "ols.pickle")],
+              deps=["clean"], code=fit_code),
+        Stage("fit_glm", fit_glm_stage, [os.path.join(BUILD_DIR, "gamma_identity.pickle")],
+              deps=["clean"], code=fit_code),
+        Stage("fit_xgb_sale", fit_xgb_sale_stage, [os.path.join(BUILD_DIR, "xgb_model.json")],
+              deps=["clean"], code=fit_code),
+        Stage("fit_xgb_rent", fit_xgb_rent_stage, [os.path.join(BUILD_DIR, "xgb_model_rent.json")],
+              deps=["clean"], code=fit_code),
+        Stage("conformal", conformal_stage, [os.path.join(BUILD_DIR, "conformal_residuals.npz")],
+              deps=["fit_xgb_sale", "fit_xgb_rent"], code=fit_code),
+        Stage("evaluation", evaluation_stage, [os.path.join(BUILD_DIR, "models.json")],
+              deps=["standardization", "fit_ols", "fit_glm", "fit_xgb_sale", "fit_xgb_rent", "conformal"],
+              code=fit_code + ["formula_prediction.py", "tree_ensemble.py", "model_interface.py"]),
+        Stage("artifacts", artifacts_stage, list(MODEL_ARTIFACTS.values()),
+              deps=["standardization", "fit_ols", "fit_glm", "fit_xgb_sale", "fit_xgb_rent", "conformal",
+                    "evaluation"], code=["model_registry.py"]),
+    ])
 
 
 def main():
-    clean_data.clean()
+    import argparse
+
+    arg_parser = argparse.ArgumentParser(description="Run the full pipeline, recomputing only stale stages")
+    arg_parser.add_argument("--xml", default="data/roca.xml", help="Roca XML feed")
+    arg_parser.add_argument("--city", action="append", dest="cities")
+    arg_parser.add_argument("--property-type", action="append", dest="property_types")
+    arg_parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    arg_parser.add_argument("--force", action="store_true", help="Ignore the cache and run every stage")
+    args = arg_parser.parse_args()
+
+    os.makedirs(BUILD_DIR, exist_ok=True)
+    pipeline = build_pipeline(args.xml, args.cities or clean_data.DEFAULT_CITIES,
+                              args.property_types or clean_data.DEFAULT_PROPERTY_TYPES)
+    pipeline.run(workers=args.workers, force=args.force)
+    publish_build()
 
 
 if __name__ == "__main__":
@@ -1,43 +1,125 @@
 # Class to be used in GUI/script to predict with the trained models
-from statsmodels.regression.linear_model import OLSResults
-from statsmodels.genmod.generalized_linear_model import GLMResults
-from xgboost import XGBRegressor
+# (statsmodels, xgboost and scipy are imported when a model is first used, to start fast)
+from collections import OrderedDict
+from functools import cached_property
+import threading
 import pandas as pd
 import numpy as np
-import scipy.stats as ss
+import os
+from cachetools import TTLCache
+from clean_data import to_numpy_dtypes
+from formula_prediction import FormulaPredictor
+from model_registry import MANIFEST_FILE, load_manifest, release_files
+from tree_ensemble import TreeEnsemble
+from training import (CONFORMAL_FILE, STANDARDIZATION_FILE, apply_standardization, conformal_quantile,
+                      load_conformal, load_standardization)
 
 
-def get_gamma_prediction_interval(model, X_new, alpha=0.05, n_simulations=10000):
+PREDICTION_COLUMNS = ["mean", "mean_ci_lower", "mean_ci_upper", "obs_ci_lower", "obs_ci_upper"]
+
+# Up to this many rows, XGBoost models are scored with the NumPy evaluator (tree_ensemble.py),
+# which skips DMatrix construction; bigger batches go through xgboost itself
+TREE_FAST_PATH_ROWS = 256
+
+# Predictions are cached per record (canonical feature tuple) for requests up to CACHE_MAX_ROWS rows
+PREDICTION_CACHE_SIZE = 4096
+PREDICTION_CACHE_TTL = 3600
+CACHE_MAX_ROWS = 256
+
+# LiveModelInterface: how often the registry manifest is checked, and how many releases stay loaded
+MANIFEST_POLL_SECONDS = 2.0
+WARM_RELEASES = 2
+
+
+def get_gamma_prediction_interval(model, X_new, alpha=0.05, predictor=None):
     """
-    Generate prediction intervals for Gamma GLM using simulation.
+    Generate prediction intervals for Gamma GLM from the Gamma quantiles, for every row of X_new.
+    predictor is a FormulaPredictor of the model, built here when not given.
+
+    Returns a DataFrame with columns mean, mean_ci_lower, mean_ci_upper, obs_ci_lower, obs_ci_upper.
     """
     # Get fitted values and parameters
-    prediction = model.get_prediction(X_new)
-    pred_summary = prediction.summary_frame(alpha=alpha)
-    mu = pred_summary['mean'].values[0]
+    pred_summary = (predictor or FormulaPredictor(model)).summary_frame(X_new, alpha)
+    mu = pred_summary['mean'].to_numpy()
 
     # Get the scale parameter (phi) from the model
-    scale = model.scale
+    phi = model.scale
 
-    # For Gamma distribution: shape = mu^2 / variance, scale = variance / mu
-    # In GLM: variance = phi * mu^2
-    shape = mu / scale
-    scale_param = scale
+    # In GLM: variance = phi * mu^2, so the Gamma distribution has
+    # shape = mu^2 / variance = 1 / phi and scale = variance / mu = phi * mu.
+    # The identity link can give a non-positive mean, which has no Gamma interval (NaN)
+    from scipy.stats import gamma
 
-    # Simulate predictions
-    simulated = np.random.gamma(shape, scale_param, n_simulations)
+    scale = np.where(mu > 0, phi * mu, np.nan)
+    lower = gamma.ppf(alpha / 2, 1 / phi, scale=scale)
+    upper = gamma.ppf(1 - alpha / 2, 1 / phi, scale=scale)
 
-    # Calculate percentiles
-    lower = np.percentile(simulated, 100 * alpha / 2)
-    upper = np.percentile(simulated, 100 * (1 - alpha / 2))
-
-    return {
+    return pd.DataFrame({
         'mean': mu,
-        'mean_ci_lower': pred_summary['mean_ci_lower'].values[0],
-        'mean_ci_upper': pred_summary['mean_ci_upper'].values[0],
+        'mean_ci_lower': pred_summary['mean_ci_lower'].to_numpy(),
+        'mean_ci_upper': pred_summary['mean_ci_upper'].to_numpy(),
         'obs_ci_lower': lower,
         'obs_ci_upper': upper
-    }
+    }, index=X_new.index)
+
+
+def get_conformal_prediction_interval(predictions, residuals, alpha=0.05, index=None):
+    """
+    Split-conformal prediction intervals around point predictions, from calibration residuals.
+
+    Returns a DataFrame with columns mean, obs_ci_lower, obs_ci_upper.
+    """
+    half_width = conformal_quantile(residuals, alpha)
+    return pd.DataFrame({
+        'mean': predictions,
+        'obs_ci_lower': predictions - half_width,
+        'obs_ci_upper': predictions + half_width
+    }, index=index)
+
+def predict_trees(model, trees: TreeEnsemble, df: pd.DataFrame) -> np.ndarray:
+    """
+    XGBoost predictions for every row of df, with the NumPy evaluator for small inputs.
+
+    Bigger batches are scored by xgboost from the evaluator's feature matrix, so categories
+    get their training codes in both paths (xgboost's own recoding fails on the non-ASCII
+    names it saves truncated).
+    """
+    if len(df) <= TREE_FAST_PATH_ROWS:
+        return trees.predict(df)
+    from xgboost import DMatrix
+    X = DMatrix(trees.features(df), feature_names=trees.feature_names,
+                feature_types=trees.feature_types, enable_categorical=True)
+    return model.get_booster().predict(X)
+
+
+def tree_contributions(model, trees: TreeEnsemble, df: pd.DataFrame) -> np.ndarray:
+    """
+    TreeSHAP contributions of every feature (in trees.feature_names order) plus the bias as
+    the last column, for every row of df; each row sums to the prediction. Features are
+    encoded by the evaluator, as in predict_trees.
+    """
+    from xgboost import DMatrix
+    X = DMatrix(trees.features(df), feature_names=trees.feature_names,
+                feature_types=trees.feature_types, enable_categorical=True)
+    return model.get_booster().predict(X, pred_contribs=True)
+
+
+def _canonical(value):
+    """Hashable form of a feature value: missing as None, numbers as float (2 and 2.0 are the same record)"""
+    if isinstance(value, (bool, np.bool_)):
+        return bool(value)
+    if pd.isna(value):
+        return None
+    if isinstance(value, (int, float, np.number)):
+        return float(value)
+    return value
+
+
+def _split_rows(predictions: dict) -> list[dict]:
+    """{model: DataFrame} into one {model: {column: value}} per row"""
+    rows = {model: frame.to_dict("records") for model, frame in predictions.items()}
+    return [{model: rows[model][i] for model in rows} for i in range(len(next(iter(rows.values()))))]
+
 
 def convert_to_xbg(df: pd.DataFrame, allowed_features: list[str] | None = None) -> pd.DataFrame:
     """Prepare DataFrame for XGBoost; optional allowed_features keeps only trained columns."""
@@ -57,34 +139,99 @@ def convert_to_xbg(df: pd.DataFrame, allowed_features: list[str] | None = None)
         errors="ignore"
     )
     boolean = df.select_dtypes(include="boolean")
-    cat = df.select_dtypes(include="object").astype("category")
+    cat = df.select_dtypes(include=["object", "category"]).astype("category")
     X = pd.concat([num, boolean, cat], axis=1)
     return X
 
 
 class ModelInterface:
 
-    def __init__(self):
-        self.ols = OLSResults.load("models/ols.pickle")
-        self.glm = GLMResults.load("models/gamma_identity.pickle")
-        base_params = {
-            'device': 'cpu',  # GPU is hard to configure
-            'tree_method': 'hist',
-            'enable_categorical': True,
-            'random_state': 67,
-            'n_jobs': 1,
-            'verbosity': 1
-        }
+    XGB_BASE_PARAMS = {
+        'device': 'cpu',  # GPU is hard to configure
+        'tree_method': 'hist',
+        'enable_categorical': True,
+        'random_state': 67,
+        'n_jobs': 1,
+        'verbosity': 1
+    }
+
+    ARTIFACT_FILES = {
+        'ols': "models/ols.pickle",
+        'glm': "models/gamma_identity.pickle",
+        'xgb': "models/xgb_model.json",
+        'rent': "xgb_model_rent.json",
+        'standardization': STANDARDIZATION_FILE,
+        'conformal': CONFORMAL_FILE,
+    }
 
-        self.xgb = XGBRegressor(**base_params)
-        self.xgb.load_model("models/xgb_model.json")
-        #self.std_data = pd.read_csv("data/std_data.csv")
-        self.full_data = pd.read_csv("data/clean_data_sell.csv")
-        self.rent_model = XGBRegressor(**base_params)
-        self.rent_model.load_model("xgb_model_rent.json")
+    def __init__(self, cache_size: int = PREDICTION_CACHE_SIZE, cache_ttl: float = PREDICTION_CACHE_TTL,
+                 artifact_files: dict | None = None, version: str | None = None):
+        # Artifact paths default to the fixed locations above; a registry release gives its own
+        self.artifact_files = {**self.ARTIFACT_FILES, **(artifact_files or {})}
+        self.version = version
+        # LRU cache with expiry of per-record predictions, shared by every user of this instance
+        # (gui.py keeps a single one); cleared when an artifact file changes
+        self.cache = TTLCache(cache_size, cache_ttl)
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._cache_version = None
+        self._cache_lock = threading.Lock()
+
+    # Every model and artifact is loaded on first use, so startup only pays for what is used
+
+    @cached_property
+    def ols(self):
+        from statsmodels.regression.linear_model import OLSResults
+        return OLSResults.load(self.artifact_files['ols'])
+
+    @cached_property
+    def glm(self):
+        from statsmodels.genmod.generalized_linear_model import GLMResults
+        return GLMResults.load(self.artifact_files['glm'])
+
+    # Design matrices, coefficients and covariances of the formula models, so predictions
+    # skip patsy (formula_prediction.py)
+    @cached_property
+    def ols_predictor(self):
+        return FormulaPredictor(self.ols)
+
+    @cached_property
+    def glm_predictor(self):
+        return FormulaPredictor(self.glm)
+
+    @cached_property
+    def xgb(self):
+        from xgboost import XGBRegressor
+        model = XGBRegressor(**self.XGB_BASE_PARAMS)
+        model.load_model(self.artifact_files['xgb'])
+        return model
+
+    @cached_property
+    def rent_model(self):
+        from xgboost import XGBRegressor
+        model = XGBRegressor(**self.XGB_BASE_PARAMS)
+        model.load_model(self.artifact_files['rent'])
+        return model
+
+    @cached_property
+    def xgb_trees(self):
+        return TreeEnsemble.load(self.artifact_files['xgb'])
+
+    @cached_property
+    def rent_trees(self):
+        return TreeEnsemble.load(self.artifact_files['rent'])
+
+    @cached_property
+    def sale_features(self):
+        # Every column the sale models read, i.e. what identifies a record in the cache
+        return sorted(set(self.ols_predictor.design.variables) | set(self.glm_predictor.design.variables)
+                      | set(self.xgb_trees.feature_names))
+
+    @cached_property
+    def rent_features(self):
         # Booster may not expose feature_names; fallback to known training columns
         booster_feats = self.rent_model.get_booster().feature_names
-        self.rent_features = booster_feats or [
+        return booster_feats or [
             "bedrooms", "bathrooms", "parking_spaces",
             "area_util", "area_total", "condominium_fee",
             "has_pool", "has_bbq", "has_playground", "has_sauna",
@@ -93,6 +240,82 @@ class ModelInterface:
             "property_type"
         ]
 
+    @cached_property
+    def standardization(self):
+        # Standardization parameters computed at training time (main.py standardization stage)
+        return load_standardization(self._artifact('standardization'))
+
+    @cached_property
+    def conformal_residuals(self):
+        # Calibration residuals for the XGBoost intervals (main.py conformal stage)
+        return load_conformal(self._artifact('conformal'))
+
+    def _artifact(self, key: str) -> str:
+        """Path of an artifact that must exist; serving never refits from the training data"""
+        path = self.artifact_files[key]
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Model artifact '{key}' not found at {path}: build it with main.py "
+                                    f"(needs the training data) or serve a registry release that has it")
+        return path
+
+    @classmethod
+    def from_manifest(cls, manifest: dict, manifest_path: str = MANIFEST_FILE, **kwargs) -> "ModelInterface":
+        """Interface over the artifacts of a registry release (model_registry.py)"""
+        return cls(artifact_files=release_files(manifest, manifest_path), version=manifest['version'], **kwargs)
+
+    def warm_up(self) -> "ModelInterface":
+        """Load every model and artifact now instead of on first use"""
+        for name in ("ols_predictor", "glm_predictor", "xgb_trees", "rent_trees", "xgb", "rent_model",
+                     "sale_features", "standardization", "conformal_residuals"):
+            getattr(self, name)
+        return self
+
+    def model_version(self) -> tuple:
+        """Modification time and size of every artifact file (None when missing)"""
+        version = []
+        for path in self.artifact_files.values():
+            try:
+                stat = os.stat(path)
+                version.append((stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                version.append(None)
+        return tuple(version)
+
+    def cache_info(self) -> dict:
+        return {
+            'hits': self.cache_hits,
+            'misses': self.cache_misses,
+            'size': len(self.cache),
+            'maxsize': self.cache.maxsize,
+            'ttl': self.cache.ttl,
+        }
+
+    def _cached_rows(self, kind: tuple, record: pd.DataFrame, features: list[str], compute) -> list:
+        """
+        Per-row results of compute(rows) (a list with one item per row), taken from the cache
+        when the same features were already scored with the current artifacts
+        """
+        version = self.model_version()
+        columns = [record[name].tolist() if name in record.columns else [None] * len(record) for name in features]
+        keys = [kind + tuple(_canonical(value) for value in row) for row in zip(*columns)]
+        with self._cache_lock:
+            if version != self._cache_version:
+                self.cache.clear()
+                self._cache_version = version
+            results = [self.cache.get(key) for key in keys]
+        missing = [i for i, result in enumerate(results) if result is None]
+
+        if missing:
+            for i, result in zip(missing, compute(record.iloc[missing])):
+                results[i] = result
+        with self._cache_lock:
+            self.cache_hits += len(keys) - len(missing)
+            self.cache_misses += len(missing)
+            if version == self._cache_version:
+                for i in missing:
+                    self.cache[keys[i]] = results[i]
+        return results
+
     # Use a dictionary or pandas row as input, with all the columns/fields used in the model (modelling.ipynb)
     def standardize_record(self, record: pd.DataFrame) -> pd.DataFrame:
         """
@@ -100,83 +323,161 @@ class ModelInterface:
 
         Parameters:
         -----------
-        record : dict
-            A dictionary containing the features of a new record
-        self.full_data : pd.DataFrame
-            The original training data used to compute statistics
+        record : pd.DataFrame
+            Rows with the features of new records
 
         Returns:
         --------
-        dict : Standardized record ready for prediction
+        pd.DataFrame : Standardized records ready for prediction
         """
-        # Create a copy to avoid modifying the original
-        std_record : pd.Series = record.copy()
-
-        # Helper function for standardization
-        stdize = lambda series, lim: (series - ss.tmean(series, limits=(None, lim))) / ss.tstd(series, limits=(None, lim))
-
-        # Get numeric columns (excluding the special ones)
-        num_cols = self.full_data.select_dtypes(include="number").drop(
-            columns=["sale_price", "area_util", "area_total", "condominium_fee"]
-        ).columns
-
-        # Standardize area_util
-        if "area_util" in std_record.columns:
-            mean_val = ss.tmean(self.full_data["area_util"], limits=(None, 1000))
-            std_val = ss.tstd(self.full_data["area_util"], limits=(None, 1000))
-            std_record["area_util"] = (std_record["area_util"] - mean_val) / std_val
-
-        # Standardize area_total
-        if "area_total" in std_record.columns:
-            mean_val = ss.tmean(self.full_data["area_total"], limits=(None, 1000))
-            std_val = ss.tstd(self.full_data["area_total"], limits=(None, 1000))
-            std_record["area_total"] = (std_record["area_total"] - mean_val) / std_val
-
-        # Standardize condominium_fee
-        if "condominium_fee" in std_record.columns:
-            mean_val = ss.tmean(self.full_data["condominium_fee"], limits=(None, 1700))
-            std_val = ss.tstd(self.full_data["condominium_fee"], limits=(None, 1700))
-            std_record["condominium_fee"] = (std_record["condominium_fee"] - mean_val) / std_val
-
-        # Create exponential features
-        if "area_util" in std_record.columns:
-            std_record["exp(area_util)"] = np.exp(std_record["area_util"])
-
-        if "area_total" in std_record.columns:
-            std_record["exp(area_total)"] = np.exp(std_record["area_total"])
-
-
-        # Standardize remaining numeric columns
-        for col in num_cols:
-            if col in std_record.columns:
-                limit = ss.quantile(self.full_data[col], 0.99)
-                mean_val = ss.tmean(self.full_data[col], limits=(None, limit))
-                std_val = ss.tstd(self.full_data[col], limits=(None, limit))
-                std_record[col] = (std_record[col] - mean_val) / std_val
-
-        return std_record
+        return apply_standardization(record, self.standardization)
 
     # ("sale_price ~ bedrooms + bathrooms + parking_spaces + area_total + C(property_type) + "
     #  "condominium_fee + has_pool + has_bbq + has_playground +has_sauna + has_party_room + has_sports_court + "
     #  "has_24h_security + has_laundry + has_closet + has_office + has_pantry + amenity_score")
     def get_predictions(self, record : pd.DataFrame, alpha = 0.05):
+        if not 0 < len(record) <= CACHE_MAX_ROWS:
+            return self._compute_predictions(record, alpha)
+        rows = self._cached_rows(("sale", alpha), record, self.sale_features,
+                                 lambda df: _split_rows(self._compute_predictions(df, alpha)))
+        return {model: pd.DataFrame.from_records([row[model] for row in rows], index=record.index)
+                for model in rows[0]}
+
+    def _compute_predictions(self, record : pd.DataFrame, alpha = 0.05):
+        # Plain NumPy dtypes for the design matrices and XGBoost
+        record = to_numpy_dtypes(record)
         std_record = self.standardize_record(record)
-        print(dict(std_record.iloc[0]))
         # Returns DataFrame with columns: mean, mean_se, mean_ci_lower, mean_ci_upper,
         #                                  obs_ci_lower, obs_ci_upper
-        ols_pred = self.ols.get_prediction(std_record).summary_frame(alpha=alpha)
+        ols_pred = self.ols_predictor.summary_frame(std_record, alpha)
 
-        glm_pred = get_gamma_prediction_interval(self.glm, record, alpha)
+        glm_pred = get_gamma_prediction_interval(self.glm, std_record, alpha, self.glm_predictor)
 
-        xgb_pred = self.xgb.predict(convert_to_xbg(std_record))
+        xgb_pred = get_conformal_prediction_interval(predict_trees(self.xgb, self.xgb_trees, std_record),
+                                                     self.conformal_residuals["sale"], alpha, record.index)
         return {
             "ols" : ols_pred,
             "glm" : glm_pred,
             "xgb" : xgb_pred
         }
+
+    def predict_batch(self, df : pd.DataFrame, alpha = 0.05) -> pd.DataFrame:
+        """
+        Sale price predictions of every model for every row of df, in one call per model.
+
+        Returns a tidy DataFrame indexed like df, with one row per (record, model) and columns
+        model, mean, mean_ci_lower, mean_ci_upper, obs_ci_lower, obs_ci_upper
+        (XGBoost has only conformal prediction intervals, so its mean_ci columns are NaN).
+        """
+        predictions = self.get_predictions(df, alpha)
+        frames = {model: frame.reindex(columns=PREDICTION_COLUMNS) for model, frame in predictions.items()}
+        return pd.concat(frames, names=["model", df.index.name]).reset_index(level="model")
+
     def predict_rent(self, record : pd.DataFrame):
-        return self.rent_model.predict(convert_to_xbg(record, allowed_features=self.rent_features))
+        if not 0 < len(record) <= CACHE_MAX_ROWS:
+            return predict_trees(self.rent_model, self.rent_trees, to_numpy_dtypes(record))
+        rows = self._cached_rows(("rent",), record, self.rent_trees.feature_names,
+                                 lambda df: list(predict_trees(self.rent_model, self.rent_trees, to_numpy_dtypes(df))))
+        return np.array(rows, dtype=np.float32)
+
+    def predict_rent_interval(self, record : pd.DataFrame, alpha = 0.05) -> pd.DataFrame:
+        """Rent predictions with split-conformal intervals (columns mean, obs_ci_lower, obs_ci_upper)"""
+        return get_conformal_prediction_interval(self.predict_rent(record), self.conformal_residuals["rent"],
+                                                 alpha, record.index)
+
+    def explain(self, record : pd.DataFrame, model : str = "sale") -> pd.DataFrame:
+        """
+        Contribution of every feature to the XGBoost prediction of each record ("sale" or "rent"),
+        in the model's units (sale price in 10^5), with a "bias" column; each row sums to the
+        prediction. Cached per record like the predictions.
+        """
+        if model == "sale":
+            booster, trees = self.xgb, self.xgb_trees
+            prepare = lambda df: self.standardize_record(to_numpy_dtypes(df))
+        elif model == "rent":
+            booster, trees = self.rent_model, self.rent_trees
+            prepare = to_numpy_dtypes
+        else:
+            raise ValueError(f"Unknown model {model!r}, expected 'sale' or 'rent'")
+        columns = trees.feature_names + ["bias"]
+
+        if not 0 < len(record) <= CACHE_MAX_ROWS:
+            contributions = tree_contributions(booster, trees, prepare(record))
+        else:
+            contributions = self._cached_rows(("explain", model), record, trees.feature_names,
+                                              lambda df: list(tree_contributions(booster, trees, prepare(df))))
+        return pd.DataFrame(np.asarray(contributions).reshape(len(record), len(columns)),
+                            index=record.index, columns=columns)
+
+
+class LiveModelInterface:
+    """
+    ModelInterface that follows the registry manifest (model_registry.py)
+
+    A background thread polls the manifest; a new release is loaded and warmed up there and
+    then swapped in with a single assignment, so predictions already running finish on the
+    release they started with. The last WARM_RELEASES releases stay loaded, so rolling back
+    is immediate. Without a manifest the fixed artifact paths of ModelInterface are used.
+    Every other attribute is the current ModelInterface's.
+    """
 
+    def __init__(self, manifest_path: str = MANIFEST_FILE, poll_seconds: float = MANIFEST_POLL_SECONDS,
+                 watch: bool = True, **kwargs):
+        self.manifest_path = manifest_path
+        self.poll_seconds = poll_seconds
+        self._kwargs = kwargs
+        self._releases = OrderedDict()
+        self._manifest_stat = None
+        self.current = ModelInterface(**kwargs)
+        # Startup keeps ModelInterface's lazy loading; releases found later are warmed up first
+        self.check(warm_up=False)
+        self._stop = threading.Event()
+        if watch:
+            threading.Thread(target=self._watch, name="model-manifest-watcher", daemon=True).start()
+
+    def __getattr__(self, name):
+        return getattr(self.current, name)
+
+    @property
+    def releases(self) -> list[str]:
+        """Versions kept loaded, oldest first"""
+        return list(self._releases)
+
+    def check(self, warm_up: bool = True) -> bool:
+        """Swap to the manifest's release if it changed; True when a swap happened"""
+        try:
+            stat = os.stat(self.manifest_path)
+        except FileNotFoundError:
+            return False
+        if (stat.st_mtime_ns, stat.st_size) == self._manifest_stat:
+            return False
+        self._manifest_stat = (stat.st_mtime_ns, stat.st_size)
+
+        manifest = load_manifest(self.manifest_path)
+        if manifest['version'] == self.current.version:
+            return False
+        interface = self._releases.pop(manifest['version'], None)
+        if interface is None:
+            interface = ModelInterface.from_manifest(manifest, self.manifest_path, **self._kwargs)
+            if warm_up:
+                interface.warm_up()
+        self._releases[manifest['version']] = interface
+        while len(self._releases) > WARM_RELEASES:
+            self._releases.popitem(last=False)
+        self.current = interface
+        return True
+
+    def _watch(self):
+        while not self._stop.wait(self.poll_seconds):
+            try:
+                if self.check():
+                    print(f"✓ Serving model release {self.current.version}")
+            except Exception as error:
+                # A broken release must not take the service down: keep serving the current one
+                print(f"✗ Could not load model release from {self.manifest_path}: {error}")
+
+    def close(self):
+        self._stop.set()
 
 
 if __name__ == "__main__" :
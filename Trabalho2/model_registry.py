@@ -0,0 +1,132 @@
+# Versioned model releases and the manifest that tells ModelInterface which one to serve
+import hashlib
+import json
+import os
+import shutil
+from datetime import datetime, timezone
+
+
+REGISTRY_DIR = "models"
+MANIFEST_FILE = "models/manifest.json"
+RELEASES_DIR = "releases"
+RELEASE_FILE = "release.json"
+MANIFEST_VERSION = 1
+
+# Artifacts of a release (keys of ModelInterface.ARTIFACT_FILES) and the models among them
+RELEASE_ARTIFACTS = ("ols", "glm", "xgb", "rent", "standardization", "conformal")
+RELEASE_MODELS = ("ols", "glm", "xgb", "rent")
+
+
+def _release_version(files: dict) -> str:
+    """Content hash of the artifacts: republishing the same models gives the same version"""
+    digest = hashlib.blake2b(digest_size=8)
+    for key in RELEASE_ARTIFACTS:
+        digest.update(key.encode())
+        with open(files[key], "rb") as f:
+            for chunk in iter(lambda: f.read(8 * 1024 * 1024), b""):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _write_json(data: dict, path: str):
+    """Write through a temporary file and rename, so readers never see a partial file"""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def load_manifest(path: str = MANIFEST_FILE) -> dict | None:
+    """Current manifest, None when nothing was published yet"""
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get('format') != MANIFEST_VERSION:
+        raise ValueError(f"Unsupported manifest format {manifest.get('format')} in {path}")
+    return manifest
+
+
+def release_files(manifest: dict, manifest_path: str = MANIFEST_FILE) -> dict:
+    """Paths of the manifest's artifacts (stored relative to the manifest)"""
+    base = os.path.dirname(manifest_path)
+    return {key: os.path.join(base, path) for key, path in manifest['artifacts'].items()}
+
+
+def publish_release(files: dict, models: dict, registry_dir: str = REGISTRY_DIR) -> str:
+    """
+    Copy a set of artifacts into a new release and make it the current one
+
+    Parameters:
+    -----------
+    files : dict
+        Path of every artifact in RELEASE_ARTIFACTS
+    models : dict
+        Per model in RELEASE_MODELS: features, scaler (artifact key or None) and metrics
+
+    Returns:
+    --------
+    str : Version of the release (content hash of the artifacts)
+    """
+    version = _release_version(files)
+    manifest_path = os.path.join(registry_dir, os.path.basename(MANIFEST_FILE))
+    current = load_manifest(manifest_path)
+    release_dir = os.path.join(registry_dir, RELEASES_DIR, version)
+    if current is not None and current['version'] == version and os.path.isdir(release_dir):
+        return version
+
+    os.makedirs(release_dir, exist_ok=True)
+    artifacts = {}
+    for key in RELEASE_ARTIFACTS:
+        name = os.path.basename(files[key])
+        shutil.copy2(files[key], os.path.join(release_dir, name))
+        artifacts[key] = os.path.join(RELEASES_DIR, version, name)
+
+    manifest = {
+        'format': MANIFEST_VERSION,
+        'version': version,
+        'created': datetime.now(timezone.utc).isoformat(),
+        # Republishing the current version (its release directory was lost) keeps its previous
+        'previous': (current['previous'] if current['version'] == version else current['version'])
+                    if current else None,
+        'artifacts': artifacts,
+        'models': {name: {'artifact': name, **models[name]} for name in RELEASE_MODELS},
+    }
+    _write_json(manifest, os.path.join(release_dir, RELEASE_FILE))
+    _write_json(manifest, manifest_path)
+    return version
+
+
+def rollback(manifest_path: str = MANIFEST_FILE) -> str:
+    """Make the release before the current one current again, returns its version"""
+    manifest = load_manifest(manifest_path)
+    if manifest is None or not manifest['previous']:
+        raise ValueError("No previous release to roll back to")
+    release_path = os.path.join(os.path.dirname(manifest_path), RELEASES_DIR, manifest['previous'], RELEASE_FILE)
+    with open(release_path, encoding="utf-8") as f:
+        previous = json.load(f)
+    _write_json(previous, manifest_path)
+    return previous['version']
+
+
+if __name__ == "__main__":
+    import argparse
+
+    arg_parser = argparse.ArgumentParser(description="Inspect or roll back the model registry")
+    arg_parser.add_argument("--manifest", default=MANIFEST_FILE)
+    arg_parser.add_argument("--rollback", action="store_true", help="Serve the previous release again")
+    args = arg_parser.parse_args()
+
+    if args.rollback:
+        try:
+            print(f"✓ Rolled back to {rollback(args.manifest)}")
+        except ValueError as error:
+            print(f"✗ {error}")
+    manifest = load_manifest(args.manifest)
+    if manifest is None:
+        print("No release published yet")
+    else:
+        print(f"✓ Current release {manifest['version']} ({manifest['created']}), previous {manifest['previous']}")
+        for name, model in manifest['models'].items():
+            metrics = ", ".join(f"{metric} {value:.4g}" for metric, value in model['metrics'].items())
+            print(f"  - {name}: {len(model['features'])} features, scaler {model['scaler']}, {metrics}")
@@ -0,0 +1,145 @@
+# K-fold and bootstrap evaluation of the formula models of modelling.ipynb (OLS and Gamma GLMs)
+import os
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import training
+
+
+# Gamma link of each GLM compared in modelling.ipynb; None is the OLS
+MODELS = {
+    'ols': None,
+    'gamma_identity': "Identity",
+    'gamma_log': "Log",
+    'gamma_inverse': "InversePower",
+}
+METRICS = ("mse", "rmse", "mae", "r2")
+
+N_FOLDS = 5
+N_BOOTSTRAP = 200
+
+
+def design_matrices(data: pd.DataFrame, formula: str = training.SALE_FORMULA) -> tuple[np.ndarray, np.ndarray]:
+    """Response and design matrix of the formula, built once for every fit"""
+    from patsy import dmatrices
+
+    y, X = dmatrices(formula, data, return_type="matrix")
+    return np.asarray(y, dtype=float).ravel(), np.asarray(X, dtype=float)
+
+
+# Worker state: the design matrix is sent once per process by the pool initializer
+_y = None
+_X = None
+
+
+def _init_worker(y: np.ndarray, X: np.ndarray):
+    global _y, _X
+    _y, _X = y, X
+
+
+def _fit(model: str, y: np.ndarray, X: np.ndarray):
+    import statsmodels.api as sm
+
+    link = MODELS[model]
+    if link is None:
+        return sm.OLS(y, X).fit()
+    family = sm.families.Gamma(link=getattr(sm.families.links, link)())
+    return sm.GLM(y, X, family=family).fit()
+
+
+def evaluate_split(train_idx: np.ndarray, test_idx: np.ndarray) -> dict:
+    """Metrics of every model fit on the train rows and scored on the test rows (NaN if a fit fails)"""
+    y, X = _y, _X
+    scores = {}
+    for model in MODELS:
+        try:
+            with warnings.catch_warnings():
+                # Identity and inverse links are outside the Gamma domain, as warned in the notebook
+                warnings.simplefilter("ignore")
+                prediction = _fit(model, y[train_idx], X[train_idx]).predict(X[test_idx])
+            if not np.isfinite(prediction).all():
+                raise ValueError("Non-finite predictions")
+            scores[model] = training.regression_metrics(y[test_idx], prediction)
+        except (ValueError, np.linalg.LinAlgError):
+            scores[model] = {metric: np.nan for metric in METRICS}
+    return scores
+
+
+def kfold_splits(n: int, n_folds: int = N_FOLDS, seed: int = training.SEED) -> list:
+    from sklearn.model_selection import KFold
+
+    return list(KFold(n_folds, shuffle=True, random_state=seed).split(np.arange(n)))
+
+
+def bootstrap_splits(n: int, n_resamples: int = N_BOOTSTRAP, seed: int = training.SEED) -> list:
+    """Resamples with replacement, scored on their out-of-bag rows"""
+    rng = np.random.default_rng(seed)
+    splits = []
+    for _ in range(n_resamples):
+        train_idx = rng.integers(0, n, n)
+        out_of_bag = np.ones(n, dtype=bool)
+        out_of_bag[train_idx] = False
+        splits.append((train_idx, np.flatnonzero(out_of_bag)))
+    return splits
+
+
+def summarize(scores: pd.DataFrame, alpha: float = 0.05) -> pd.DataFrame:
+    """Mean, std and percentile interval of every metric per scheme and model"""
+    grouped = scores.groupby(["scheme", "model"])[list(METRICS)]
+    summary = pd.concat({
+        'mean': grouped.mean(),
+        'std': grouped.std(),
+        'lower': grouped.quantile(alpha / 2),
+        'upper': grouped.quantile(1 - alpha / 2),
+        'failed': grouped.agg(lambda values: values.isna().sum()),
+    }, axis=1).swaplevel(axis=1)
+    return summary[[(metric, stat) for metric in METRICS
+                    for stat in ("mean", "std", "lower", "upper", "failed")]]
+
+
+def validate(data: pd.DataFrame, n_folds: int = N_FOLDS, n_bootstrap: int = N_BOOTSTRAP,
+             workers: int = os.cpu_count() or 1, seed: int = training.SEED) -> pd.DataFrame:
+    """
+    K-fold CV and out-of-bag bootstrap of every model in MODELS, fits run in a process pool
+
+    Returns:
+    --------
+    pd.DataFrame : One row per (scheme, resample, model) with the metrics of training.regression_metrics
+    """
+    y, X = design_matrices(data)
+    splits = ([("kfold", split) for split in kfold_splits(len(y), n_folds, seed)] +
+              [("bootstrap", split) for split in bootstrap_splits(len(y), n_bootstrap, seed)])
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(y, X)) as pool:
+        results = pool.map(evaluate_split, *zip(*(split for _, split in splits)), chunksize=4)
+        rows = [{'scheme': scheme, 'resample': i, 'model': model, **metrics}
+                for i, ((scheme, _), scores) in enumerate(zip(splits, results))
+                for model, metrics in scores.items()]
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    import argparse
+    from clean_data import load_clean_data
+
+    arg_parser = argparse.ArgumentParser(description="K-fold and bootstrap metrics of the OLS and Gamma GLMs")
+    arg_parser.add_argument("--folds", type=int, default=N_FOLDS)
+    arg_parser.add_argument("--bootstrap", type=int, default=N_BOOTSTRAP)
+    arg_parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    arg_parser.add_argument("--seed", type=int, default=training.SEED)
+    arg_parser.add_argument("--output", help="CSV with the metrics of every resample")
+    args = arg_parser.parse_args()
+
+    start = time.perf_counter()
+    scores = validate(training.standardize(load_clean_data("sell")), args.folds, args.bootstrap,
+                      args.workers, args.seed)
+    print(f"✓ {scores['resample'].nunique()} resamples x {len(MODELS)} models in {time.perf_counter() - start:.1f} s")
+    with pd.option_context("display.width", 200, "display.max_columns", None, "display.precision", 4):
+        print(summarize(scores))
+    if args.output:
+        scores.to_csv(args.output, index=False)
+        print(f"✓ Scores saved to {args.output}")
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Streaming Aggregators for Roca Property Data
+Statistics computed while records flow through the parser or exporter, so they
+are ready at the end of a pass without another traversal or a DataFrame.
+"""
+
+import math
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Iterator, List
+
+if TYPE_CHECKING:
+    from parse_roca import Property
+
+
+DEFAULT_QUANTILES = (0.01, 0.25, 0.5, 0.75, 0.99)
+
+
+class Aggregator:
+    """Consumes records one at a time; result() can be read at any point"""
+
+    def update(self, record: Any):
+        raise NotImplementedError
+
+    def result(self) -> Dict[str, Any]:
+        raise NotImplementedError
+
+
+def observe(records: Iterable[Any], aggregators: List[Aggregator]) -> Iterator[Any]:
+    """Pass records through unchanged while feeding every aggregator"""
+    for record in records:
+        for aggregator in aggregators:
+            aggregator.update(record)
+        yield record
+
+
+class QuantileSketch:
+    """
+    Min/max/mean plus approximate quantiles in bounded memory
+
+    Values are counted in logarithmic buckets (DDSketch style), so each quantile is
+    within relative_accuracy of the true value whatever the number of values.
+    Non-positive values share a single bucket.
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01):
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self._buckets: Dict[int, int] = {}
+        self._non_positive = 0
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value: float):
+        self.count += 1
+        self.total += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        if value <= 0:
+            self._non_positive += 1
+        else:
+            key = math.ceil(math.log(value) / self._log_gamma)
+            self._buckets[key] = self._buckets.get(key, 0) + 1
+
+    def quantile(self, q: float) -> float | None:
+        """Approximate q-quantile (None when empty)"""
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = self._non_positive
+        if rank < seen:
+            return min(max(0.0, self.min), self.max)
+        for key in sorted(self._buckets):
+            seen += self._buckets[key]
+            if rank < seen:
+                estimate = 2 * self.gamma ** key / (self.gamma + 1)
+                return min(max(estimate, self.min), self.max)
+        return self.max
+
+    def summary(self, quantiles: Iterable[float] = DEFAULT_QUANTILES) -> Dict[str, Any]:
+        if not self.count:
+            return {'count': 0, 'min': None, 'max': None, 'mean': None, 'quantiles': {}}
+        return {
+            'count': self.count,
+            'min': self.min,
+            'max': self.max,
+            'mean': self.total / self.count,
+            'quantiles': {q: self.quantile(q) for q in quantiles},
+        }
+
+
+def _to_float(value: Any) -> float | None:
+    if value is None or value == '':
+        return None
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        return None
+
+
+class PropertyStatsAggregator(Aggregator):
+    """Feed statistics over Property records (what get_statistics reports, and more)"""
+
+    # Property fields whose empty values count as nulls
+    FIELDS = {
+        'code': lambda p: p.code,
+        'reference': lambda p: p.reference,
+        'title': lambda p: p.title,
+        'description': lambda p: p.description,
+        'property_type': lambda p: p.property_type,
+        'property_subtype': lambda p: p.property_subtype,
+        'postal_code': lambda p: p.location.postal_code,
+        'address': lambda p: p.location.address,
+        'locality': lambda p: p.location.locality,
+        'latitude': lambda p: p.location.latitude,
+        'longitude': lambda p: p.location.longitude,
+        'publisher_code': lambda p: p.publisher_code,
+        'prices': lambda p: p.prices,
+        'images': lambda p: p.images,
+        'characteristics': lambda p: p.characteristics,
+    }
+
+    def __init__(self):
+        self.total = 0
+        self.operations: Dict[str, int] = {}
+        self.property_types: Dict[str, int] = {}
+        self.total_images = 0
+        self.with_location = 0
+        self.nulls = {name: 0 for name in self.FIELDS}
+        self.sketches = {name: QuantileSketch()
+                         for name in ('sale_price', 'rent_price', 'area_util', 'area_total')}
+
+    def update(self, prop: 'Property'):
+        self.total += 1
+
+        for price in prop.prices:
+            self.operations[price.operation] = self.operations.get(price.operation, 0) + 1
+            if price.operation == 'VENTA':
+                self.sketches['sale_price'].add(price.amount_cents / 100)
+            elif price.operation == 'ALQUILER':
+                self.sketches['rent_price'].add(price.amount_cents / 100)
+
+        if prop.property_type:
+            self.property_types[prop.property_type] = self.property_types.get(prop.property_type, 0) + 1
+
+        self.total_images += len(prop.images)
+
+        if prop.location and prop.location.address:
+            self.with_location += 1
+
+        for name, get_value in self.FIELDS.items():
+            if not get_value(prop):
+                self.nulls[name] += 1
+
+        for char in prop.characteristics:
+            if char.name == 'AREA_UTIL' or char.name == 'AREA_TOTAL':
+                area = _to_float(char.value or char.value_id)
+                if area is not None:
+                    self.sketches[char.name.lower()].add(area)
+
+    def result(self) -> Dict[str, Any]:
+        return {
+            'total_properties': self.total,
+            'for_sale': self.operations.get('VENTA', 0),
+            'for_rent': self.operations.get('ALQUILER', 0),
+            'operations': dict(self.operations),
+            'property_types': dict(self.property_types),
+            'total_images': self.total_images,
+            'properties_with_location': self.with_location,
+            'null_rates': {name: count / self.total if self.total else 0.0
+                           for name, count in self.nulls.items()},
+            **{name: sketch.summary() for name, sketch in self.sketches.items()},
+        }
+
+
+class RowStatsAggregator(Aggregator):
+    """Per-column null counts and numeric sketches over table rows (dicts)"""
+
+    def __init__(self, columns: Iterable[str], numeric_columns: Iterable[str] = ()):
+        self.rows = 0
+        self.nulls = {name: 0 for name in columns}
+        self.sketches = {name: QuantileSketch() for name in numeric_columns}
+
+    def update(self, row: Dict[str, Any]):
+        self.rows += 1
+        for name in self.nulls:
+            if row[name] is None:
+                self.nulls[name] += 1
+        for name, sketch in self.sketches.items():
+            value = row[name]
+            if value is not None:
+                sketch.add(value)
+
+    def result(self) -> Dict[str, Any]:
+        return {
+            'rows': self.rows,
+            'null_percentages': {name: count / self.rows * 100 if self.rows else 0.0
+                                 for name, count in self.nulls.items()},
+            'numeric_summaries': {name: sketch.summary() for name, sketch in self.sketches.items()},
+        }
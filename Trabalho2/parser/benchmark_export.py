@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Export Benchmark for the Roca Data Layer
+Generates synthetic feeds of several sizes and measures parse throughput, export
+time, peak RSS and output size, plus write/read-back times of the main table in
+each candidate storage format. Results are written as JSON.
+"""
+
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from multiprocessing import get_context
+from typing import Any, Dict, List
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+
+from parse_roca import RocaXMLParser
+from export_parquet import RocaParquetExporter
+from synthetic_feed import generate_feed
+
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+
+# Candidate formats for the main table: name -> (writer, reader)
+FORMATS = {
+    'parquet_snappy': (
+        lambda table, path: pq.write_table(table, path, compression='snappy'),
+        lambda path: pq.read_table(path),
+    ),
+    'parquet_zstd': (
+        lambda table, path: pq.write_table(table, path, compression='zstd'),
+        lambda path: pq.read_table(path),
+    ),
+    'parquet_snappy_plain': (
+        lambda table, path: pq.write_table(table, path, compression='snappy', use_dictionary=False),
+        lambda path: pq.read_table(path),
+    ),
+    'feather_uncompressed': (
+        lambda table, path: feather.write_feather(table, path, compression='uncompressed'),
+        lambda path: pa.ipc.open_file(pa.memory_map(path)).read_all(),
+    ),
+    'feather_lz4': (
+        lambda table, path: feather.write_feather(table, path, compression='lz4'),
+        lambda path: feather.read_table(path),
+    ),
+    'feather_zstd': (
+        lambda table, path: feather.write_feather(table, path, compression='zstd'),
+        lambda path: feather.read_table(path),
+    ),
+}
+
+
+def _peak_rss_mb() -> float:
+    """Peak resident set size of this process (ru_maxrss is KiB on Linux, bytes on macOS)"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+
+def _dir_size(path: str) -> int:
+    """Total size in bytes of every file under path"""
+    return sum(os.path.getsize(os.path.join(root, name))
+               for root, _, names in os.walk(path) for name in names)
+
+
+def _best_of(repeats: int, func, *args) -> float:
+    """Fastest wall time of func(*args) over repeats runs"""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def run_parse_export(xml_file: str, output_dir: str, workers: int = 1) -> Dict[str, Any]:
+    """
+    Parse and export one feed, timing each step
+
+    Meant to run in a fresh process so the peak RSS belongs to this feed only.
+    """
+    parser = RocaXMLParser(xml_file)
+
+    start = time.perf_counter()
+    properties = parser.parse(workers=workers)
+    parse_seconds = time.perf_counter() - start
+    parse_peak_rss = _peak_rss_mb()
+
+    exporter = RocaParquetExporter(parser)
+    start = time.perf_counter()
+    exporter.export_to_parquet(output_dir)
+    export_seconds = time.perf_counter() - start
+
+    return {
+        'listings': len(properties),
+        'feed_bytes': os.path.getsize(xml_file),
+        'parse_seconds': parse_seconds,
+        'listings_per_second': len(properties) / parse_seconds if parse_seconds else None,
+        'feed_mb_per_second': os.path.getsize(xml_file) / 1024 / 1024 / parse_seconds if parse_seconds else None,
+        'parse_peak_rss_mb': parse_peak_rss,
+        'export_seconds': export_seconds,
+        'peak_rss_mb': _peak_rss_mb(),
+        'output_bytes': _dir_size(output_dir),
+    }
+
+
+def benchmark_formats(main_path: str, output_dir: str, repeats: int = 3) -> Dict[str, Dict[str, Any]]:
+    """Write the main table in every candidate format and time writing and reading it back"""
+    table = pq.read_table(main_path)
+    results = {}
+
+    for name, (write, read) in FORMATS.items():
+        path = os.path.join(output_dir, f'properties_main.{name}')
+        write_seconds = _best_of(1, write, table, path)
+        read_seconds = _best_of(repeats, read, path)
+        to_pandas_seconds = _best_of(repeats, lambda: read(path).to_pandas())
+        results[name] = {
+            'bytes': os.path.getsize(path),
+            'write_seconds': write_seconds,
+            'read_seconds': read_seconds,
+            'read_to_pandas_seconds': to_pandas_seconds,
+        }
+        os.remove(path)
+
+    return results
+
+
+def benchmark_size(n_listings: int, work_dir: str, workers: int = 1, repeats: int = 3) -> Dict[str, Any]:
+    """Full benchmark for one feed size"""
+    xml_file = generate_feed(os.path.join(work_dir, f'roca_{n_listings}.xml'), n_listings)
+    output_dir = os.path.join(work_dir, f'out_{n_listings}')
+    os.makedirs(output_dir)
+
+    # Fresh interpreter per size, so peak RSS does not carry over between sizes
+    with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as pool:
+        result = pool.submit(run_parse_export, xml_file, output_dir, workers).result()
+
+    result['formats'] = benchmark_formats(os.path.join(output_dir, 'properties_main.parquet'),
+                                          work_dir, repeats)
+    os.remove(xml_file)
+    return result
+
+
+def run_benchmark(sizes: List[int], workers: int = 1, repeats: int = 3) -> Dict[str, Any]:
+    """Benchmark every feed size and return the results with environment metadata"""
+    results = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        for n_listings in sizes:
+            print(f"Benchmarking {n_listings} listings...")
+            results.append(benchmark_size(n_listings, work_dir, workers, repeats))
+
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'pandas': pd.__version__,
+            'pyarrow': pa.__version__,
+        },
+        'workers': workers,
+        'results': results,
+    }
+
+
+def main():
+    """Run the export benchmark and save the results as JSON"""
+    import argparse
+
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument('--sizes', default=','.join(str(size) for size in DEFAULT_SIZES),
+                            help='Comma-separated feed sizes (number of listings)')
+    arg_parser.add_argument('--workers', type=int, default=1, help='Parser worker processes')
+    arg_parser.add_argument('--repeats', type=int, default=3, help='Read-back repetitions (best is kept)')
+    arg_parser.add_argument('--output', default='benchmark_export.json')
+    args = arg_parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',')]
+    report = run_benchmark(sizes, args.workers, args.repeats)
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+
+    for result in report['results']:
+        print(f"\n=== {result['listings']} listings ===")
+        print(f"✓ Parse: {result['parse_seconds']:.2f} s ({result['listings_per_second']:.0f} listings/s)")
+        print(f"✓ Export: {result['export_seconds']:.2f} s, {result['output_bytes'] / 1024 / 1024:.1f} MB")
+        print(f"✓ Peak RSS: {result['peak_rss_mb']:.0f} MB")
+        for name, fmt in result['formats'].items():
+            print(f"  - {name}: {fmt['bytes'] / 1024 / 1024:.2f} MB, "
+                  f"read {fmt['read_seconds'] * 1000:.1f} ms, "
+                  f"to pandas {fmt['read_to_pandas_seconds'] * 1000:.1f} ms")
+
+    print(f"\n✓ Results saved to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Memory Benchmark for Parsed Roca Properties
+Parses a synthetic feed and reports how much memory the in-memory records take.
+"""
+
+import os
+import tempfile
+import time
+import tracemalloc
+from parse_roca import RocaXMLParser
+from synthetic_feed import generate_feed
+
+
+def measure_parse_memory(xml_file: str) -> dict:
+    """Parse xml_file into memory and measure the retained size of the records"""
+    parser = RocaXMLParser(xml_file)
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    properties = parser.parse()
+    elapsed = time.perf_counter() - start
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'listings': len(properties),
+        'parse_seconds': elapsed,
+        'retained_mb': retained / 1024 / 1024,
+        'peak_mb': peak / 1024 / 1024,
+        'bytes_per_listing': retained / max(len(properties), 1),
+    }
+
+
+def main():
+    """Run the memory benchmark on a synthetic feed"""
+    import argparse
+
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument('--listings', type=int, default=1_000_000)
+    arg_parser.add_argument('--feed', help='Existing XML feed to use instead of a synthetic one')
+    args = arg_parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        xml_file = args.feed
+        if xml_file is None:
+            print(f"Generating synthetic feed with {args.listings} listings...")
+            xml_file = generate_feed(os.path.join(tmp_dir, 'roca.xml'), args.listings)
+
+        print(f"Parsing {xml_file}...")
+        result = measure_parse_memory(xml_file)
+
+    print(f"✓ Listings: {result['listings']}")
+    print(f"✓ Parse time: {result['parse_seconds']:.1f} s (with tracemalloc)")
+    print(f"✓ Retained memory: {result['retained_mb']:.1f} MB")
+    print(f"✓ Peak memory: {result['peak_mb']:.1f} MB")
+    print(f"✓ Bytes per listing: {result['bytes_per_listing']:.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Parse Benchmark for the Roca Parser
+Generates a synthetic feed and measures streaming parse time with the serial parser
+and with process pools of several sizes. Results are written as JSON.
+"""
+
+import json
+import os
+import platform
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+
+from parse_roca import RocaXMLParser, available_cpus
+from synthetic_feed import generate_feed
+
+
+DEFAULT_LISTINGS = 20_000
+
+
+def time_parse(xml_file: str, workers: int, repeats: int = 3) -> Dict[str, Any]:
+    """Best wall time of streaming every property of the feed with the given workers"""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        count = sum(1 for _ in RocaXMLParser(xml_file).iter_properties(workers))
+        timings.append(time.perf_counter() - start)
+    seconds = min(timings)
+    return {
+        'workers': workers,
+        # iter_properties caps the workers at the usable CPUs
+        'effective_workers': min(workers, available_cpus()),
+        'listings': count,
+        'seconds': seconds,
+        'listings_per_second': count / seconds if seconds else None,
+    }
+
+
+def run_benchmark(n_listings: int, worker_counts: List[int], repeats: int = 3) -> Dict[str, Any]:
+    """Parse one synthetic feed with every worker count"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        xml_file = generate_feed(os.path.join(work_dir, f'roca_{n_listings}.xml'), n_listings)
+        results = [time_parse(xml_file, workers, repeats) for workers in worker_counts]
+
+    serial = results[0]['seconds']
+    for result in results:
+        result['speedup'] = serial / result['seconds'] if result['seconds'] else None
+
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'available_cpus': available_cpus(),
+        },
+        'feed_listings': n_listings,
+        'results': results,
+    }
+
+
+def main():
+    """Run the parse benchmark and save the results as JSON"""
+    import argparse
+
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument('--listings', type=int, default=DEFAULT_LISTINGS)
+    arg_parser.add_argument('--workers', default=f'1,2,{max(available_cpus(), 2)}',
+                            help='Comma-separated worker counts (the first one is the baseline)')
+    arg_parser.add_argument('--repeats', type=int, default=3, help='Repetitions (best is kept)')
+    arg_parser.add_argument('--output', default='benchmark_parse.json')
+    args = arg_parser.parse_args()
+
+    worker_counts = list(dict.fromkeys(int(workers) for workers in args.workers.split(',')))
+    report = run_benchmark(args.listings, worker_counts, args.repeats)
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+
+    for result in report['results']:
+        print(f"✓ {result['workers']} workers ({result['effective_workers']} used): {result['seconds']:.2f} s, "
+              f"{result['listings_per_second']:.0f} listings/s, speedup {result['speedup']:.2f}x")
+    print(f"\n✓ Results saved to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Incremental Ingestion of Daily Roca Feeds
+Fingerprints every Imovel record and exports only the listings that were added,
+changed or removed since the previous run. A compaction step folds the deltas
+back into the Parquet tables read by the rest of the pipeline.
+"""
+
+import hashlib
+import os
+import re
+import shutil
+from typing import Dict, Iterator, List, Tuple
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from parse_roca import RocaXMLParser, Property
+from export_parquet import RocaParquetExporter
+
+
+MANIFEST_FILE = 'manifest.parquet'
+DELTAS_DIR = 'deltas'
+REMOVED_FILE = 'removed.parquet'
+ML_FEATURES_FILE = 'properties_ml_features.parquet'
+MAIN_DATASET_DIR = 'properties_main'
+TABLE_FILES = {
+    'main': 'properties_main.parquet',
+    'characteristics': 'properties_characteristics.parquet',
+    'images': 'properties_images.parquet',
+    'prices': 'properties_prices.parquet',
+}
+
+CODE_PATTERN = re.compile(rb'<codigoAnuncio>\s*(.*?)\s*</codigoAnuncio>', re.S)
+
+
+class RocaDeltaIngestor:
+    """Ingest a Roca feed into a Parquet directory, writing only what changed"""
+
+    def __init__(self, xml_file: str, output_dir: str = '.'):
+        self.parser = RocaXMLParser(xml_file)
+        self.output_dir = output_dir
+        self.manifest_path = os.path.join(output_dir, MANIFEST_FILE)
+        self.deltas_dir = os.path.join(output_dir, DELTAS_DIR)
+
+    def fingerprint(self) -> Iterator[Tuple[str, bytes, int, bytes]]:
+        """Yield (codigoAnuncio, content hash, byte offset, raw record) for every Imovel"""
+        for offset, record in self.parser.iter_records():
+            match = CODE_PATTERN.search(record)
+            code = match.group(1).decode(errors='replace') if match else ''
+            digest = hashlib.blake2b(record, digest_size=16).digest()
+            yield code, digest, offset, record
+
+    def ingest(self) -> Dict[str, int]:
+        """
+        Compare the feed against the previous manifest and write a delta
+
+        Only added or changed records are parsed; unchanged ones are skipped
+        after hashing their raw bytes.
+
+        Returns:
+            Counts of added, changed, removed and unchanged listings
+        """
+        previous = self._load_manifest()
+        encoding = self.parser.detect_encoding()
+
+        codes, digests = [], []
+        upserts: List[Property] = []
+        counts = {'added': 0, 'changed': 0, 'removed': 0, 'unchanged': 0}
+
+        for code, digest, offset, record in self.fingerprint():
+            old_digest = previous.pop(code, None)
+            if old_digest == digest:
+                codes.append(code)
+                digests.append(digest)
+                counts['unchanged'] += 1
+                continue
+
+            property_obj = self.parser.parse_record(record, offset, encoding)
+            if property_obj is None:
+                # Malformed records are dropped, as in a full export
+                if old_digest is not None:
+                    previous[code] = old_digest
+                continue
+
+            codes.append(code)
+            digests.append(digest)
+            upserts.append(property_obj)
+            counts['added' if old_digest is None else 'changed'] += 1
+
+        # Whatever is left in the previous manifest is gone from today's feed
+        removed = list(previous)
+        counts['removed'] = len(removed)
+
+        if upserts or removed:
+            self._write_delta(upserts, removed)
+
+        self._write_manifest(codes, digests)
+        return counts
+
+    def compact(self) -> Dict[str, int]:
+        """
+        Fold every pending delta into the flat Parquet tables and delete the deltas
+
+        Returns:
+            Number of rows in each compacted table
+        """
+        delta_dirs = self._delta_dirs()
+        if not delta_dirs:
+            return {}
+
+        # Version 0 is the current snapshot, version i the i-th delta
+        sources = [self.output_dir] + delta_dirs
+
+        latest: Dict[str, int] = {}
+        removed_at: Dict[str, int] = {}
+        for version, source in enumerate(sources):
+            main_path = os.path.join(source, TABLE_FILES['main'])
+            if os.path.exists(main_path):
+                for code in pq.read_table(main_path, columns=['property_code'])['property_code'].to_pylist():
+                    latest[code] = version
+            removed_path = os.path.join(source, REMOVED_FILE)
+            if version > 0 and os.path.exists(removed_path):
+                for code in pq.read_table(removed_path)['property_code'].to_pylist():
+                    removed_at[code] = version
+
+        # Each listing survives only in the newest version that wrote it, unless removed later
+        keep = {code: version for code, version in latest.items()
+                if version > removed_at.get(code, -1)}
+
+        row_counts = {}
+        for table_name, file_name in TABLE_FILES.items():
+            paths = [(version, os.path.join(source, file_name)) for version, source in enumerate(sources)]
+            paths = [(version, path) for version, path in paths if os.path.exists(path)]
+            if not paths:
+                continue
+
+            # The newest file defines the schema (older snapshots may use other dictionary types)
+            schema = pq.read_schema(paths[-1][1])
+            tables = []
+            for version, path in paths:
+                table = pq.read_table(path).cast(schema)
+                mask = [keep.get(code) == version for code in table['property_code'].to_pylist()]
+                tables.append(table.filter(pa.array(mask, type=pa.bool_())))
+
+            compacted = pa.concat_tables(tables)
+            tmp_path = os.path.join(self.output_dir, file_name + '.tmp')
+            pq.write_table(compacted, tmp_path, compression='snappy')
+            os.replace(tmp_path, os.path.join(self.output_dir, file_name))
+            row_counts[table_name] = compacted.num_rows
+
+        # The ML features table depends on the whole main table, so rebuild it
+        exporter = RocaParquetExporter(self.parser, properties=[])
+        exporter.load_main_parquet(os.path.join(self.output_dir, TABLE_FILES['main']))
+        ml_df = exporter.create_ml_features_dataframe()
+        ml_df.to_parquet(os.path.join(self.output_dir, ML_FEATURES_FILE),
+                         engine='pyarrow', compression='snappy', index=False)
+        row_counts['ml_features'] = len(ml_df)
+
+        # Readers filter the partitioned copy of the main table, so refresh it too
+        exporter.write_partitioned_dataset(os.path.join(self.output_dir, MAIN_DATASET_DIR))
+
+        for delta_dir in delta_dirs:
+            shutil.rmtree(delta_dir)
+
+        return row_counts
+
+    def _delta_dirs(self) -> List[str]:
+        """Pending delta directories, oldest first"""
+        if not os.path.isdir(self.deltas_dir):
+            return []
+        names = sorted(name for name in os.listdir(self.deltas_dir) if name.isdigit())
+        return [os.path.join(self.deltas_dir, name) for name in names]
+
+    def _write_delta(self, upserts: List[Property], removed: List[str]):
+        """Write added/changed listings and removed codes to a new delta directory"""
+        existing = self._delta_dirs()
+        sequence = int(os.path.basename(existing[-1])) + 1 if existing else 1
+        delta_dir = os.path.join(self.deltas_dir, f'{sequence:06d}')
+        os.makedirs(delta_dir)
+
+        if upserts:
+            exporter = RocaParquetExporter(self.parser, properties=upserts)
+            exporter.export_to_parquet(delta_dir, include_normalized=True, include_ml=False,
+                                       include_partitioned=False)
+
+        removed_table = pa.table({'property_code': pa.array(removed, type=pa.string())})
+        pq.write_table(removed_table, os.path.join(delta_dir, REMOVED_FILE))
+
+    def _load_manifest(self) -> Dict[str, bytes]:
+        """Fingerprints of the previous run (empty on the first run)"""
+        if not os.path.exists(self.manifest_path):
+            return {}
+        manifest = pq.read_table(self.manifest_path)
+        return dict(zip(manifest['property_code'].to_pylist(), manifest['content_hash'].to_pylist()))
+
+    def _write_manifest(self, codes: List[str], digests: List[bytes]):
+        """Replace the manifest atomically, after the delta has been written"""
+        manifest = pa.table({
+            'property_code': pa.array(codes, type=pa.string()),
+            'content_hash': pa.array(digests, type=pa.binary(16)),
+        })
+        tmp_path = self.manifest_path + '.tmp'
+        pq.write_table(manifest, tmp_path)
+        os.replace(tmp_path, self.manifest_path)
+
+
+def main():
+    """Ingest today's feed and/or compact pending deltas"""
+    import argparse
+
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    subparsers = arg_parser.add_subparsers(dest='command', required=True)
+
+    ingest_parser = subparsers.add_parser('ingest', help='Write a delta for a new feed')
+    ingest_parser.add_argument('xml_file', nargs='?', default='roca.xml')
+    ingest_parser.add_argument('--output-dir', default='.')
+    ingest_parser.add_argument('--compact', action='store_true',
+                               help='Compact right after ingesting')
+
+    compact_parser = subparsers.add_parser('compact', help='Fold pending deltas into the tables')
+    compact_parser.add_argument('--output-dir', default='.')
+
+    args = arg_parser.parse_args()
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    if args.command == 'ingest':
+        ingestor = RocaDeltaIngestor(args.xml_file, args.output_dir)
+        counts = ingestor.ingest()
+        print(f"✓ Added: {counts['added']}, changed: {counts['changed']}, "
+              f"removed: {counts['removed']}, unchanged: {counts['unchanged']}")
+        if not args.compact:
+            return
+    else:
+        ingestor = RocaDeltaIngestor('roca.xml', args.output_dir)
+
+    row_counts = ingestor.compact()
+    if not row_counts:
+        print("✓ Nothing to compact")
+    for table_name, rows in row_counts.items():
+        print(f"✓ {table_name}: {rows} rows after compaction")
+
+
+if __name__ == '__main__':
+    main()
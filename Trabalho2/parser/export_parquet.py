@@ -4,181 +4,424 @@ Parquet Exporter for Roca Real Estate Data
 Transforms XML property data into Parquet format for data analysis and ML.
 """
 
+import os
 import pandas as pd
 import numpy as np
-from typing import Dict, Any
-from parse_roca import RocaXMLParser
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from typing import Dict, Any, Iterable, Iterator
+from parse_roca import RocaXMLParser, Property
+from aggregators import RowStatsAggregator
+
+
+# Rows per record batch / row group when streaming to Parquet
+DEFAULT_BATCH_SIZE = 50_000
+
+_CATEGORY = pa.dictionary(pa.int32(), pa.string())
+
+# Hive partition keys of the main dataset (city is parsed from 'Neighborhood,City' locality)
+PARTITION_COLUMNS = ['city', 'property_type']
+MIN_ROWS_PER_GROUP = 10_000
+
+# Main table columns summarized (min/max/quantiles) while exporting
+STATS_NUMERIC_COLUMNS = ['sale_price', 'rent_price', 'area_util', 'area_total',
+                         'condominium_fee', 'price_per_sqm_sale', 'price_per_sqm_rent']
+
+# Arrow schema of the main table, matching the dtypes set by _optimize_dtypes
+MAIN_SCHEMA = pa.schema([
+    ('property_code', pa.string()),
+    ('property_reference', pa.string()),
+    ('title', pa.string()),
+    ('description', pa.string()),
+    ('property_type', _CATEGORY),
+    ('property_subtype', _CATEGORY),
+    ('postal_code', pa.string()),
+    ('address', pa.string()),
+    ('locality', pa.string()),
+    ('latitude', pa.float64()),
+    ('longitude', pa.float64()),
+    ('show_map', _CATEGORY),
+    ('sale_price', pa.float64()),
+    ('rent_price', pa.float64()),
+    ('has_sale_price', pa.bool_()),
+    ('has_rent_price', pa.bool_()),
+    ('bedrooms', pa.int64()),
+    ('bathrooms', pa.int64()),
+    ('suites', pa.int64()),
+    ('parking_spaces', pa.int64()),
+    ('area_util', pa.float64()),
+    ('area_total', pa.float64()),
+    ('condominium_fee', pa.float64()),
+    ('property_tax', pa.float64()),
+    ('has_pool', pa.bool_()),
+    ('has_bbq', pa.bool_()),
+    ('has_gym', pa.bool_()),
+    ('has_playground', pa.bool_()),
+    ('has_sauna', pa.bool_()),
+    ('has_party_room', pa.bool_()),
+    ('has_sports_court', pa.bool_()),
+    ('has_24h_security', pa.bool_()),
+    ('has_laundry', pa.bool_()),
+    ('has_closet', pa.bool_()),
+    ('has_office', pa.bool_()),
+    ('has_pantry', pa.bool_()),
+    ('image_count', pa.int64()),
+    ('publisher_code', _CATEGORY),
+    ('publisher_name', pa.string()),
+    ('publisher_phone', pa.string()),
+    ('price_per_sqm_sale', pa.float64()),
+    ('price_per_sqm_rent', pa.float64()),
+    ('total_monthly_cost', pa.float64()),
+    ('size_category', _CATEGORY),
+    ('amenity_score', pa.int64()),
+])
+
+CHARACTERISTICS_SCHEMA = pa.schema([
+    ('property_code', pa.string()),
+    ('characteristic_id', pa.string()),
+    ('characteristic_name', pa.string()),
+    ('value', pa.string()),
+    ('value_id', pa.string()),
+])
+
+IMAGES_SCHEMA = pa.schema([
+    ('property_code', pa.string()),
+    ('image_sequence', pa.int64()),
+    ('image_url', pa.string()),
+])
+
+PRICES_SCHEMA = pa.schema([
+    ('property_code', pa.string()),
+    ('amount', pa.float64()),
+    ('currency', pa.string()),
+    ('operation', pa.string()),
+    ('operation_type', pa.string()),
+])
+
+
+class ParquetTableWriter:
+    """Buffer rows column by column and write them to Parquet in fixed-size record batches"""
+    
+    def __init__(self, path: str, schema: pa.Schema, batch_size: int = DEFAULT_BATCH_SIZE):
+        self.path = path
+        self.schema = schema
+        self.batch_size = batch_size
+        self.rows_written = 0
+        # In-memory (Arrow) size of everything written
+        self.arrow_bytes = 0
+        self._columns = {name: [] for name in schema.names}
+        self._buffered = 0
+        self._writer = pq.ParquetWriter(path, schema, compression='snappy')
+    
+    def append(self, row: Dict[str, Any]):
+        """Add one row, flushing a record batch (row group) when the buffer is full"""
+        for name, values in self._columns.items():
+            values.append(row[name])
+        self._buffered += 1
+        
+        if self._buffered >= self.batch_size:
+            self.flush()
+    
+    def flush(self):
+        """Write buffered rows as one record batch and empty the buffers"""
+        if not self._buffered:
+            return
+        
+        arrays = [pa.array(self._columns[field.name], type=field.type) for field in self.schema]
+        batch = pa.RecordBatch.from_arrays(arrays, schema=self.schema)
+        self._writer.write_batch(batch)
+        self.rows_written += self._buffered
+        self.arrow_bytes += batch.nbytes
+        
+        for values in self._columns.values():
+            values.clear()
+        self._buffered = 0
+    
+    def close(self):
+        """Flush remaining rows and finish the file"""
+        self.flush()
+        self._writer.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
 
 
 class RocaParquetExporter:
     """Export Roca property data to Parquet format for analysis and ML"""
     
-    def __init__(self, parser: RocaXMLParser):
+    def __init__(self, parser: RocaXMLParser, properties: Iterable[Property] = None):
         self.parser = parser
-        self.properties = parser.properties
+        # Explicit subset of properties to export instead of the whole feed
+        self._properties = properties
+        # Main table is built (or read back from the export) once and shared by every consumer
+        self._main_df: pd.DataFrame | None = None
+        self._main_path: str | None = None
+        # Main table statistics gathered during the last export
+        self._main_stats: Dict[str, Any] | None = None
+    
+    @property
+    def properties(self) -> Iterable[Property]:
+        """Parsed properties if available, otherwise a fresh stream from the XML file"""
+        if self._properties is not None:
+            return self._properties
+        if self.parser.properties:
+            return self.parser.properties
+        return self.parser.iter_properties()
     
     def create_main_dataframe(self) -> pd.DataFrame:
-        """Create main properties DataFrame with core information"""
-        data = []
+        """Create main properties DataFrame with core information (built once, then reused)"""
+        if self._main_df is not None:
+            return self._main_df
         
-        for prop in self.properties:
-            # Extract basic info
-            row = {
-                'property_code': prop.code,
-                'property_reference': prop.reference,
-                'title': prop.title,
-                'description': prop.description,
-                'property_type': prop.property_type,
-                'property_subtype': prop.property_subtype,
-            }
-            
-            # Extract location
-            row['postal_code'] = prop.location.postal_code
-            row['address'] = prop.location.address
-            row['locality'] = prop.location.locality
-            row['latitude'] = self._safe_float(prop.location.latitude)
-            row['longitude'] = self._safe_float(prop.location.longitude)
-            row['show_map'] = prop.location.show_map
-            
-            # Extract pricing
-            sale_price = None
-            rent_price = None
-            for price in prop.prices:
-                if price.operation == 'VENTA':
-                    sale_price = float(price.amount)
-                elif price.operation == 'ALQUILER':
-                    rent_price = float(price.amount)
-            
-            row['sale_price'] = sale_price
-            row['rent_price'] = rent_price
-            row['has_sale_price'] = sale_price is not None
-            row['has_rent_price'] = rent_price is not None
-            
-            # Extract key characteristics
-            characteristics_dict = {c.name: c.value or c.value_id for c in prop.characteristics}
-            
-            row['bedrooms'] = self._safe_int(characteristics_dict.get('QUARTO'))
-            row['bathrooms'] = self._safe_int(characteristics_dict.get('BANHEIRO'))
-            row['suites'] = self._safe_int(characteristics_dict.get('SUITE'))
-            row['parking_spaces'] = self._safe_int(characteristics_dict.get('VAGA'))
-            row['area_util'] = self._safe_float(characteristics_dict.get('AREA_UTIL'))
-            row['area_total'] = self._safe_float(characteristics_dict.get('AREA_TOTAL'))
-            row['condominium_fee'] = self._safe_float(characteristics_dict.get('CONDOMINIO'))
-            row['property_tax'] = self._safe_float(characteristics_dict.get('IPTU'))
-            
-            # Boolean amenities
-            row['has_pool'] = characteristics_dict.get('PISCINA') == '1'
-            row['has_bbq'] = characteristics_dict.get('CHURRASQUEIRA') == '1'
-            row['has_gym'] = characteristics_dict.get('ACADEMIA') == '1'
-            row['has_playground'] = characteristics_dict.get('PLAYGROUND') == '1'
-            row['has_sauna'] = characteristics_dict.get('SAUNA') == '1'
-            row['has_party_room'] = characteristics_dict.get('SALÃO_DE_FESTAS') == '1'
-            row['has_sports_court'] = characteristics_dict.get('QUADRA_POLIESPORTIVA') == '1'
-            row['has_24h_security'] = characteristics_dict.get('PORTARIA_24_HORAS') == '1'
-            row['has_laundry'] = characteristics_dict.get('LAVANDERIA') == '1'
-            row['has_closet'] = characteristics_dict.get('CLOSET') == '1'
-            row['has_office'] = characteristics_dict.get('ESCRITORIO') == '1'
-            row['has_pantry'] = characteristics_dict.get('DESPENSA') == '1'
+        if self._main_path is not None:
+            # Already exported: reading the Parquet file is cheaper than a new pass
+            df = pd.read_parquet(self._main_path, engine='pyarrow')
+            # Streamed categories are in order of appearance; sort them like astype('category')
+            for col in df.select_dtypes(include=['category']).columns:
+                df[col] = df[col].cat.reorder_categories(sorted(df[col].cat.categories))
+        else:
+            data = [self._build_main_row(prop) for prop in self.properties]
+            df = pd.DataFrame(data)
             
-            # Image count
-            row['image_count'] = len(prop.images)
-            
-            # Publisher info
-            row['publisher_code'] = prop.publisher_code
-            row['publisher_name'] = prop.publisher_name
-            row['publisher_phone'] = prop.publisher_phone
-            
-            # Derived features for ML
-            row['price_per_sqm_sale'] = (sale_price / row['area_util'] 
-                                        if sale_price and row['area_util'] else None)
-            row['price_per_sqm_rent'] = (rent_price / row['area_util'] 
-                                        if rent_price and row['area_util'] else None)
-            
-            # Total monthly cost (rent + condominium)
-            row['total_monthly_cost'] = None
-            if rent_price:
-                condo = row['condominium_fee'] or 0
-                row['total_monthly_cost'] = rent_price + condo
-            
-            # Property size category
-            if row['area_util']:
-                if row['area_util'] < 50:
-                    row['size_category'] = 'small'
-                elif row['area_util'] < 100:
-                    row['size_category'] = 'medium'
-                elif row['area_util'] < 200:
-                    row['size_category'] = 'large'
-                else:
-                    row['size_category'] = 'extra_large'
-            else:
-                row['size_category'] = None
-            
-            # Amenity score (count of amenities)
-            amenities = [
-                row['has_pool'], row['has_bbq'], row['has_gym'], 
-                row['has_playground'], row['has_sauna'], row['has_party_room'],
-                row['has_sports_court'], row['has_24h_security']
-            ]
-            row['amenity_score'] = sum(amenities)
-            
-            data.append(row)
+            # Set proper data types
+            df = self._optimize_dtypes(df)
         
-        df = pd.DataFrame(data)
+        self._main_df = df
+        return df
+    
+    def write_main_parquet(self, path: str, batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+        """
+        Stream the main properties table straight into a Parquet file
         
-        # Set proper data types
-        df = self._optimize_dtypes(df)
+        Rows are accumulated column by column and flushed as one Arrow record
+        batch (and row group) every batch_size rows, so memory stays constant
+        whatever the size of the feed.
         
-        return df
+        Returns:
+            Number of rows written
+        """
+        with self._open_main_writer(path, batch_size) as writer:
+            for prop in self.properties:
+                writer.append(self._build_main_row(prop))
+        
+        self.load_main_parquet(path)
+        return writer.rows_written
+    
+    def write_partitioned_dataset(self, dataset_dir: str,
+                                  batch_size: int = DEFAULT_BATCH_SIZE) -> str:
+        """
+        Write the exported main table as a Hive-partitioned dataset (city/property_type)
+        
+        The flat main table is scanned in record batches, so memory stays bounded.
+        Readers can then prune partitions and columns with pyarrow dataset filters,
+        e.g. pd.read_parquet(dataset_dir, filters=[('city', '==', 'São Carlos')]).
+        """
+        import shutil
+        
+        if self._main_path is None:
+            raise ValueError("Main table must be exported before writing the partitioned dataset")
+        
+        source = ds.dataset(self._main_path, format='parquet')
+        schema = source.schema.append(pa.field('city', pa.string()))
+        partitioning = ds.partitioning(
+            pa.schema([schema.field('city'), pa.field('property_type', pa.string())]),
+            flavor='hive'
+        )
+        
+        def batches_with_city():
+            for batch in source.to_batches(batch_size=batch_size):
+                match = pc.extract_regex(batch['locality'], r'^[^,]*,(?P<city>[^,]*)')
+                city = pc.utf8_trim_whitespace(pc.struct_field(match, 'city'))
+                city = pc.if_else(pc.equal(city, ''), pa.scalar(None, pa.string()), city)
+                yield pa.RecordBatch.from_arrays(batch.columns + [city], schema=schema)
+        
+        # Start from scratch so partitions that disappeared from the feed do not linger
+        if os.path.isdir(dataset_dir):
+            shutil.rmtree(dataset_dir)
+        
+        parquet_format = ds.ParquetFileFormat()
+        ds.write_dataset(
+            batches_with_city(),
+            dataset_dir,
+            schema=schema,
+            format=parquet_format,
+            file_options=parquet_format.make_write_options(compression='snappy',
+                                                           write_statistics=True),
+            partitioning=partitioning,
+            min_rows_per_group=MIN_ROWS_PER_GROUP,
+            max_rows_per_group=batch_size,
+        )
+        return dataset_dir
+    
+    def load_main_parquet(self, path: str):
+        """Use an exported main table as the source of create_main_dataframe"""
+        self._main_path = path
+        self._main_df = None
+    
+    def _open_main_writer(self, path: str, batch_size: int = DEFAULT_BATCH_SIZE) -> ParquetTableWriter:
+        """Open a streaming writer for the main table, with pandas dtype metadata"""
+        schema = MAIN_SCHEMA.with_metadata(self._pandas_metadata(MAIN_SCHEMA))
+        return ParquetTableWriter(path, schema, batch_size)
+    
+    def _pandas_metadata(self, schema: pa.Schema) -> Dict[bytes, bytes]:
+        """Pandas schema metadata so readers get back the dtypes of _optimize_dtypes"""
+        empty_df = self._optimize_dtypes(pd.DataFrame({name: [] for name in schema.names}))
+        return pa.Schema.from_pandas(empty_df, preserve_index=False).metadata
+    
+    def _build_main_row(self, prop: Property) -> Dict[str, Any]:
+        """Build one row of the main properties table"""
+        # Extract basic info
+        row = {
+            'property_code': prop.code,
+            'property_reference': prop.reference,
+            'title': prop.title,
+            'description': prop.description,
+            'property_type': prop.property_type,
+            'property_subtype': prop.property_subtype,
+        }
+        
+        # Extract location
+        row['postal_code'] = prop.location.postal_code
+        row['address'] = prop.location.address
+        row['locality'] = prop.location.locality
+        row['latitude'] = self._safe_float(prop.location.latitude)
+        row['longitude'] = self._safe_float(prop.location.longitude)
+        row['show_map'] = prop.location.show_map
+        
+        # Extract pricing
+        sale_price = None
+        rent_price = None
+        for price in prop.prices:
+            if price.operation == 'VENTA':
+                sale_price = price.amount_cents / 100
+            elif price.operation == 'ALQUILER':
+                rent_price = price.amount_cents / 100
+        
+        row['sale_price'] = sale_price
+        row['rent_price'] = rent_price
+        row['has_sale_price'] = sale_price is not None
+        row['has_rent_price'] = rent_price is not None
+        
+        # Extract key characteristics
+        characteristics_dict = {c.name: c.value or c.value_id for c in prop.characteristics}
+        
+        row['bedrooms'] = self._safe_int(characteristics_dict.get('QUARTO'))
+        row['bathrooms'] = self._safe_int(characteristics_dict.get('BANHEIRO'))
+        row['suites'] = self._safe_int(characteristics_dict.get('SUITE'))
+        row['parking_spaces'] = self._safe_int(characteristics_dict.get('VAGA'))
+        row['area_util'] = self._safe_float(characteristics_dict.get('AREA_UTIL'))
+        row['area_total'] = self._safe_float(characteristics_dict.get('AREA_TOTAL'))
+        row['condominium_fee'] = self._safe_float(characteristics_dict.get('CONDOMINIO'))
+        row['property_tax'] = self._safe_float(characteristics_dict.get('IPTU'))
+        
+        # Boolean amenities
+        row['has_pool'] = characteristics_dict.get('PISCINA') == '1'
+        row['has_bbq'] = characteristics_dict.get('CHURRASQUEIRA') == '1'
+        row['has_gym'] = characteristics_dict.get('ACADEMIA') == '1'
+        row['has_playground'] = characteristics_dict.get('PLAYGROUND') == '1'
+        row['has_sauna'] = characteristics_dict.get('SAUNA') == '1'
+        row['has_party_room'] = characteristics_dict.get('SALÃO_DE_FESTAS') == '1'
+        row['has_sports_court'] = characteristics_dict.get('QUADRA_POLIESPORTIVA') == '1'
+        row['has_24h_security'] = characteristics_dict.get('PORTARIA_24_HORAS') == '1'
+        row['has_laundry'] = characteristics_dict.get('LAVANDERIA') == '1'
+        row['has_closet'] = characteristics_dict.get('CLOSET') == '1'
+        row['has_office'] = characteristics_dict.get('ESCRITORIO') == '1'
+        row['has_pantry'] = characteristics_dict.get('DESPENSA') == '1'
+        
+        # Image count
+        row['image_count'] = len(prop.images)
+        
+        # Publisher info
+        row['publisher_code'] = prop.publisher_code
+        row['publisher_name'] = prop.publisher_name
+        row['publisher_phone'] = prop.publisher_phone
+        
+        # Derived features for ML
+        row['price_per_sqm_sale'] = (sale_price / row['area_util'] 
+                                    if sale_price and row['area_util'] else None)
+        row['price_per_sqm_rent'] = (rent_price / row['area_util'] 
+                                    if rent_price and row['area_util'] else None)
+        
+        # Total monthly cost (rent + condominium)
+        row['total_monthly_cost'] = None
+        if rent_price:
+            condo = row['condominium_fee'] or 0
+            row['total_monthly_cost'] = rent_price + condo
+        
+        # Property size category
+        if row['area_util']:
+            if row['area_util'] < 50:
+                row['size_category'] = 'small'
+            elif row['area_util'] < 100:
+                row['size_category'] = 'medium'
+            elif row['area_util'] < 200:
+                row['size_category'] = 'large'
+            else:
+                row['size_category'] = 'extra_large'
+        else:
+            row['size_category'] = None
+        
+        # Amenity score (count of amenities)
+        amenities = [
+            row['has_pool'], row['has_bbq'], row['has_gym'], 
+            row['has_playground'], row['has_sauna'], row['has_party_room'],
+            row['has_sports_court'], row['has_24h_security']
+        ]
+        row['amenity_score'] = sum(amenities)
+        
+        return row
     
     def create_characteristics_dataframe(self) -> pd.DataFrame:
         """Create detailed characteristics DataFrame (normalized)"""
-        data = []
-        
-        for prop in self.properties:
-            for char in prop.characteristics:
-                row = {
-                    'property_code': prop.code,
-                    'characteristic_id': char.id,
-                    'characteristic_name': char.name,
-                    'value': char.value,
-                    'value_id': char.value_id
-                }
-                data.append(row)
-        
+        data = [row for prop in self.properties for row in self._build_characteristic_rows(prop)]
         return pd.DataFrame(data)
     
     def create_images_dataframe(self) -> pd.DataFrame:
         """Create images DataFrame"""
-        data = []
-        
-        for prop in self.properties:
-            for idx, img in enumerate(prop.images):
-                row = {
-                    'property_code': prop.code,
-                    'image_sequence': idx + 1,
-                    'image_url': img.url
-                }
-                data.append(row)
-        
+        data = [row for prop in self.properties for row in self._build_image_rows(prop)]
         return pd.DataFrame(data)
     
     def create_prices_dataframe(self) -> pd.DataFrame:
         """Create prices DataFrame"""
-        data = []
-        
-        for prop in self.properties:
-            for price in prop.prices:
-                row = {
-                    'property_code': prop.code,
-                    'amount': float(price.amount),
-                    'currency': price.currency,
-                    'operation': price.operation,
-                    'operation_type': 'sale' if price.operation == 'VENTA' else 'rent'
-                }
-                data.append(row)
-        
+        data = [row for prop in self.properties for row in self._build_price_rows(prop)]
         return pd.DataFrame(data)
     
+    def _build_characteristic_rows(self, prop: Property) -> Iterator[Dict[str, Any]]:
+        """Build the characteristics table rows of one property"""
+        for char in prop.characteristics:
+            yield {
+                'property_code': prop.code,
+                'characteristic_id': char.id,
+                'characteristic_name': char.name,
+                'value': char.value,
+                'value_id': char.value_id
+            }
+    
+    def _build_image_rows(self, prop: Property) -> Iterator[Dict[str, Any]]:
+        """Build the images table rows of one property"""
+        for idx, img in enumerate(prop.images):
+            yield {
+                'property_code': prop.code,
+                'image_sequence': idx + 1,
+                'image_url': img.url
+            }
+    
+    def _build_price_rows(self, prop: Property) -> Iterator[Dict[str, Any]]:
+        """Build the prices table rows of one property"""
+        for price in prop.prices:
+            yield {
+                'property_code': prop.code,
+                'amount': price.amount_cents / 100,
+                'currency': price.currency,
+                'operation': price.operation,
+                'operation_type': 'sale' if price.operation == 'VENTA' else 'rent'
+            }
+    
     def create_ml_features_dataframe(self) -> pd.DataFrame:
         """Create DataFrame optimized for ML with encoded categorical variables"""
         df = self.create_main_dataframe()
@@ -216,7 +459,8 @@ class RocaParquetExporter:
     
     def export_to_parquet(self, output_dir: str = '.', 
                          include_normalized: bool = True,
-                         include_ml: bool = True) -> Dict[str, str]:
+                         include_ml: bool = True,
+                         include_partitioned: bool = True) -> Dict[str, str]:
         """
         Export all DataFrames to Parquet files
         
@@ -224,46 +468,59 @@ class RocaParquetExporter:
             output_dir: Directory to save Parquet files
             include_normalized: Include normalized tables (characteristics, images, prices)
             include_ml: Include ML-optimized DataFrame
+            include_partitioned: Also write the main table as a dataset partitioned by
+                city and property type (properties_main/)
             
         Returns:
-            Dictionary mapping table name to file path
+            Dictionary mapping table name to file (or dataset directory) path
         """
-        import os
-        
-        output_files = {}
-        
-        # Main properties table
-        print("Creating main properties DataFrame...")
-        main_df = self.create_main_dataframe()
-        main_path = os.path.join(output_dir, 'properties_main.parquet')
-        main_df.to_parquet(main_path, engine='pyarrow', compression='snappy', index=False)
-        output_files['main'] = main_path
-        print(f"✓ Saved {len(main_df)} rows to {main_path}")
+        from contextlib import ExitStack
         
+        output_files = {'main': os.path.join(output_dir, 'properties_main.parquet')}
         if include_normalized:
-            # Characteristics table
-            print("Creating characteristics DataFrame...")
-            char_df = self.create_characteristics_dataframe()
-            char_path = os.path.join(output_dir, 'properties_characteristics.parquet')
-            char_df.to_parquet(char_path, engine='pyarrow', compression='snappy', index=False)
-            output_files['characteristics'] = char_path
-            print(f"✓ Saved {len(char_df)} rows to {char_path}")
-            
-            # Images table
-            print("Creating images DataFrame...")
-            img_df = self.create_images_dataframe()
-            img_path = os.path.join(output_dir, 'properties_images.parquet')
-            img_df.to_parquet(img_path, engine='pyarrow', compression='snappy', index=False)
-            output_files['images'] = img_path
-            print(f"✓ Saved {len(img_df)} rows to {img_path}")
+            output_files['characteristics'] = os.path.join(output_dir, 'properties_characteristics.parquet')
+            output_files['images'] = os.path.join(output_dir, 'properties_images.parquet')
+            output_files['prices'] = os.path.join(output_dir, 'properties_prices.parquet')
+        
+        # Single pass over the properties filling every table at once
+        print("Streaming properties into Parquet tables...")
+        with ExitStack() as stack:
+            main_writer = stack.enter_context(self._open_main_writer(output_files['main']))
+            if include_normalized:
+                row_builders = [
+                    (stack.enter_context(ParquetTableWriter(output_files['characteristics'],
+                                                            CHARACTERISTICS_SCHEMA)),
+                     self._build_characteristic_rows),
+                    (stack.enter_context(ParquetTableWriter(output_files['images'], IMAGES_SCHEMA)),
+                     self._build_image_rows),
+                    (stack.enter_context(ParquetTableWriter(output_files['prices'], PRICES_SCHEMA)),
+                     self._build_price_rows),
+                ]
+            else:
+                row_builders = []
             
-            # Prices table
-            print("Creating prices DataFrame...")
-            price_df = self.create_prices_dataframe()
-            price_path = os.path.join(output_dir, 'properties_prices.parquet')
-            price_df.to_parquet(price_path, engine='pyarrow', compression='snappy', index=False)
-            output_files['prices'] = price_path
-            print(f"✓ Saved {len(price_df)} rows to {price_path}")
+            main_stats = RowStatsAggregator(MAIN_SCHEMA.names, STATS_NUMERIC_COLUMNS)
+            for prop in self.properties:
+                row = self._build_main_row(prop)
+                main_writer.append(row)
+                main_stats.update(row)
+                for writer, build_rows in row_builders:
+                    for row in build_rows(prop):
+                        writer.append(row)
+        
+        self.load_main_parquet(output_files['main'])
+        self._main_stats = {**main_stats.result(), 'arrow_bytes': main_writer.arrow_bytes}
+        
+        print(f"✓ Saved {main_writer.rows_written} rows to {output_files['main']}")
+        for writer, _ in row_builders:
+            print(f"✓ Saved {writer.rows_written} rows to {writer.path}")
+        
+        if include_partitioned:
+            print("Writing partitioned main dataset...")
+            dataset_dir = os.path.join(output_dir, 'properties_main')
+            self.write_partitioned_dataset(dataset_dir)
+            output_files['main_dataset'] = dataset_dir
+            print(f"✓ Saved dataset partitioned by {'/'.join(PARTITION_COLUMNS)} to {dataset_dir}")
         
         if include_ml:
             # ML-optimized table
@@ -326,7 +583,16 @@ class RocaParquetExporter:
         return df
     
     def get_dataframe_info(self) -> Dict[str, Any]:
-        """Get information about the created DataFrames"""
+        """
+        Get information about the created DataFrames
+        
+        After export_to_parquet this comes from statistics gathered during the
+        export (memory usage is then the Arrow size of the table), with no
+        DataFrame built.
+        """
+        if self._main_stats is not None:
+            return self._get_streamed_info()
+        
         main_df = self.create_main_dataframe()
         
         return {
@@ -339,6 +605,34 @@ class RocaParquetExporter:
             'categorical_columns': main_df.select_dtypes(include=['category']).columns.tolist(),
             'boolean_columns': main_df.select_dtypes(include=['boolean']).columns.tolist(),
         }
+    
+    def _get_streamed_info(self) -> Dict[str, Any]:
+        """DataFrame info from export statistics and the main table schema"""
+        column_types = {}
+        for field in MAIN_SCHEMA:
+            if pa.types.is_dictionary(field.type):
+                column_types[field.name] = 'category'
+            elif pa.types.is_boolean(field.type):
+                column_types[field.name] = 'boolean'
+            elif pa.types.is_integer(field.type):
+                column_types[field.name] = 'Int64'
+            elif pa.types.is_floating(field.type):
+                column_types[field.name] = 'float64'
+            else:
+                column_types[field.name] = 'object'
+        
+        return {
+            'total_properties': self._main_stats['rows'],
+            'total_columns': len(MAIN_SCHEMA),
+            'memory_usage_mb': self._main_stats['arrow_bytes'] / 1024 / 1024,
+            'null_percentages': self._main_stats['null_percentages'],
+            'column_types': column_types,
+            'numeric_columns': [name for name, dtype in column_types.items()
+                                if dtype in ('Int64', 'float64')],
+            'categorical_columns': [name for name, dtype in column_types.items() if dtype == 'category'],
+            'boolean_columns': [name for name, dtype in column_types.items() if dtype == 'boolean'],
+            'numeric_summaries': self._main_stats['numeric_summaries'],
+        }
 
 
 def main():
@@ -347,19 +641,26 @@ def main():
     print("Roca XML to Parquet Converter")
     print("=" * 70)
     
-    # Parse XML
-    print("\n[1] Parsing XML file...")
+    # Open XML feed (properties are streamed, never loaded all at once)
+    print("\n[1] Opening XML feed...")
     parser = RocaXMLParser('roca.xml')
-    properties = parser.parse()
-    print(f"✓ Loaded {len(properties)} properties")
+    print(f"✓ Streaming properties from {parser.file_path}")
     
     # Create exporter
     print("\n[2] Creating Parquet exporter...")
     exporter = RocaParquetExporter(parser)
     print("✓ Exporter initialized")
     
-    # Get DataFrame info
-    print("\n[3] Analyzing DataFrame structure...")
+    # Export to Parquet (single pass over the feed)
+    print("\n[3] Exporting to Parquet files...")
+    output_files = exporter.export_to_parquet(
+        output_dir='.',
+        include_normalized=True,
+        include_ml=True
+    )
+    
+    # Get DataFrame info (statistics gathered during the export)
+    print("\n[4] Analyzing DataFrame structure...")
     info = exporter.get_dataframe_info()
     print(f"✓ Total properties: {info['total_properties']}")
     print(f"✓ Total columns: {info['total_columns']}")
@@ -368,20 +669,16 @@ def main():
     print(f"✓ Categorical columns: {len(info['categorical_columns'])}")
     print(f"✓ Boolean columns: {len(info['boolean_columns'])}")
     
-    # Export to Parquet
-    print("\n[4] Exporting to Parquet files...")
-    output_files = exporter.export_to_parquet(
-        output_dir='.',
-        include_normalized=True,
-        include_ml=True
-    )
-    
     print("\n" + "=" * 70)
     print("Export Summary")
     print("=" * 70)
     for table_name, file_path in output_files.items():
-        import os
-        size_mb = os.path.getsize(file_path) / 1024 / 1024
+        if os.path.isdir(file_path):
+            size_bytes = sum(os.path.getsize(os.path.join(root, name))
+                             for root, _, names in os.walk(file_path) for name in names)
+        else:
+            size_bytes = os.path.getsize(file_path)
+        size_mb = size_bytes / 1024 / 1024
         print(f"✓ {table_name}: {file_path} ({size_mb:.2f} MB)")
     
     print("\n" + "=" * 70)
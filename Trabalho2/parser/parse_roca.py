@@ -4,27 +4,48 @@ XML Parser for Roca Real Estate Listings
 Parses the roca.xml file containing property listings.
 """
 
+import mmap
+import os
+import re
+import sys
 import xml.etree.ElementTree as ET
-from typing import List, Dict, Any
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Iterable, Iterator, Tuple
 from dataclasses import dataclass, field
+from itertools import islice
 from decimal import Decimal
 
+from aggregators import Aggregator, PropertyStatsAggregator, observe
 
-@dataclass
+
+# Byte patterns used to locate records without parsing the whole document
+# ('<Imovel' alone would also match the '<Imoveis>' container)
+IMOVEL_START = re.compile(rb'<Imovel[\s>]')
+IMOVEL_END = b'</Imovel>'
+XML_ENCODING = re.compile(rb'<\?xml[^>]*encoding=["\']([A-Za-z0-9._-]+)["\']')
+
+
+@dataclass(slots=True)
 class PropertyImage:
     """Represents a property image"""
     url: str
 
 
-@dataclass
+@dataclass(slots=True)
 class PropertyPrice:
     """Represents a property price"""
-    amount: Decimal
+    amount_cents: int
     currency: str
     operation: str  # ALQUILER (rent) or VENTA (sale)
+    
+    @property
+    def amount(self) -> Decimal:
+        """Price amount as a Decimal"""
+        return Decimal(self.amount_cents) / 100
 
 
-@dataclass
+@dataclass(slots=True)
 class PropertyCharacteristic:
     """Represents a property characteristic"""
     id: str
@@ -33,7 +54,7 @@ class PropertyCharacteristic:
     value_id: str = ""
 
 
-@dataclass
+@dataclass(slots=True)
 class PropertyLocation:
     """Represents property location"""
     postal_code: str = ""
@@ -44,7 +65,7 @@ class PropertyLocation:
     show_map: str = ""
 
 
-@dataclass
+@dataclass(slots=True)
 class Property:
     """Represents a real estate property"""
     code: str
@@ -68,33 +89,135 @@ class RocaXMLParser:
     def __init__(self, file_path: str):
         self.file_path = file_path
         self.properties: List[Property] = []
+        self.search_index = None
+        # Statistics gathered while parsing, so get_statistics needs no extra pass
+        self.statistics: Dict[str, Any] | None = None
     
-    def parse(self) -> List[Property]:
+    def parse(self, workers: int = 1, aggregators: List[Aggregator] = None) -> List[Property]:
         """Parse the XML file and return list of properties"""
-        # Parse XML incrementally to handle large files
-        context = ET.iterparse(self.file_path, events=('start', 'end'))
-        context = iter(context)
+        stats = PropertyStatsAggregator()
+        self.properties = list(self.iter_properties(workers, [stats] + (aggregators or [])))
+        self.statistics = stats.result()
+        return self.properties
+    
+    def iter_properties(self, workers: int = 1,
+                        aggregators: List[Aggregator] = None) -> Iterator[Property]:
+        """
+        Yield properties one at a time without keeping them in memory
+        
+        Each aggregator is updated with every property as it is produced, so its
+        result is complete when the stream ends.
+        """
+        # More processes than usable CPUs only adds pool overhead
+        workers = min(workers, available_cpus())
+        if workers > 1:
+            properties = self._iter_properties_parallel(workers)
+        else:
+            properties = self._iter_properties_serial()
         
-        # Get root element
-        event, root = next(context)
+        if aggregators:
+            properties = observe(properties, aggregators)
         
-        for event, elem in context:
-            if event == 'end' and elem.tag == 'Imovel':
+        yield from properties
+    
+    def _iter_properties_serial(self) -> Iterator[Property]:
+        """Stream properties with a single incremental XML parser"""
+        # An Imovel is complete when it closes; 'start' events track the open elements,
+        # so each record can be detached from its container (clearing it alone would
+        # leave one empty element per record attached to <Imoveis>)
+        ancestors = []
+        for event, elem in ET.iterparse(self.file_path, events=('start', 'end')):
+            if event == 'start':
+                ancestors.append(elem)
+                continue
+            ancestors.pop()
+            if elem.tag == 'Imovel':
                 property_obj = self._parse_property(elem)
                 if property_obj:
-                    self.properties.append(property_obj)
-                # Clear element to free memory
+                    yield property_obj
+                # Clear element and drop it from its parent to free memory
                 elem.clear()
-                root.clear()
+                if ancestors:
+                    ancestors[-1].remove(elem)
+    
+    def _iter_properties_parallel(self, workers: int,
+                                  chunk_bytes: int = 4 * 1024 * 1024) -> Iterator[Property]:
+        """
+        Parse byte-aligned chunks of records in a process pool, in document order
         
-        return self.properties
+        At most 2 * workers chunks are submitted or waiting to be consumed at a time,
+        so memory stays bounded however large the feed is.
+        """
+        encoding, chunks = self._find_chunks(chunk_bytes)
+        
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            jobs = iter((self.file_path, encoding, start, end) for start, end in chunks)
+            pending = deque(executor.submit(_parse_chunk, job) for job in islice(jobs, 2 * workers))
+            while pending:
+                properties = pending.popleft().result()
+                for job in islice(jobs, 1):
+                    pending.append(executor.submit(_parse_chunk, job))
+                yield from properties
+    
+    def _find_chunks(self, chunk_bytes: int) -> Tuple[str, List[Tuple[int, int]]]:
+        """Split the file into byte ranges that each start at an Imovel record"""
+        chunks = []
+        
+        with open(self.file_path, 'rb') as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                match = IMOVEL_START.search(mm)
+                while match:
+                    start = match.start()
+                    match = IMOVEL_START.search(mm, start + chunk_bytes)
+                    chunks.append((start, match.start() if match else len(mm)))
+        
+        return self.detect_encoding(), chunks
+    
+    def detect_encoding(self) -> str:
+        """Encoding declared in the XML prolog (UTF-8 if none)"""
+        with open(self.file_path, 'rb') as f:
+            declaration = XML_ENCODING.match(f.read(1024))
+        return declaration.group(1).decode('ascii') if declaration else 'utf-8'
+    
+    def iter_records(self, start: int = 0, end: int = None) -> Iterator[Tuple[int, bytes]]:
+        """Yield (byte offset, raw bytes) of every complete Imovel record in a byte range"""
+        with open(self.file_path, 'rb') as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                end = len(mm) if end is None else end
+                match = IMOVEL_START.search(mm, start, end)
+                while match:
+                    record_start = match.start()
+                    # A record ends before the next one starts, so a missing closing tag
+                    # loses only its own record
+                    next_match = IMOVEL_START.search(mm, match.end(), end)
+                    record_limit = next_match.start() if next_match else end
+                    record_end = mm.find(IMOVEL_END, record_start, record_limit)
+                    if record_end == -1:
+                        print(f"Error parsing property at byte {record_start}: unterminated Imovel record")
+                    else:
+                        yield record_start, mm[record_start:record_end + len(IMOVEL_END)]
+                    match = next_match
+    
+    def parse_record(self, record: bytes, offset: int = None, encoding: str = 'utf-8') -> Property:
+        """Parse the raw bytes of a single Imovel record"""
+        declaration = f'<?xml version="1.0" encoding="{encoding}"?>'.encode('ascii')
+        try:
+            elem = ET.fromstring(declaration + record)
+        except ET.ParseError as e:
+            print(f"Error parsing property at byte {offset}: {e}")
+            return None
+        return self._parse_property(elem, offset=offset)
     
     def _get_text(self, element, tag: str, default: str = "") -> str:
         """Safely get text from XML element"""
         child = element.find(tag)
         return child.text if child is not None and child.text else default
     
-    def _parse_property(self, imovel_elem) -> Property:
+    def _get_symbol(self, element, tag: str, default: str = "") -> str:
+        """Get text that repeats across listings, interned so every copy is shared"""
+        return sys.intern(self._get_text(element, tag, default))
+    
+    def _parse_property(self, imovel_elem, offset: int = None) -> Property:
         """Parse a single property (Imovel) element"""
         try:
             # Basic info
@@ -113,18 +236,18 @@ class RocaXMLParser:
             # Property type
             tipo_prop = imovel_elem.find('tipoPropriedade')
             if tipo_prop is not None:
-                property_obj.property_type = self._get_text(tipo_prop, 'tipo')
-                property_obj.property_subtype = self._get_text(tipo_prop, 'subTipo')
+                property_obj.property_type = self._get_symbol(tipo_prop, 'tipo')
+                property_obj.property_subtype = self._get_symbol(tipo_prop, 'subTipo')
             
             # Characteristics
             caracteristicas = imovel_elem.find('caracteristicas')
             if caracteristicas is not None:
                 for carac in caracteristicas.findall('caracteristica'):
                     char = PropertyCharacteristic(
-                        id=self._get_text(carac, 'id'),
-                        name=self._get_text(carac, 'nome'),
-                        value=self._get_text(carac, 'valor'),
-                        value_id=self._get_text(carac, 'idValor')
+                        id=self._get_symbol(carac, 'id'),
+                        name=self._get_symbol(carac, 'nome'),
+                        value=self._get_symbol(carac, 'valor'),
+                        value_id=self._get_symbol(carac, 'idValor')
                     )
                     property_obj.characteristics.append(char)
             
@@ -134,9 +257,9 @@ class RocaXMLParser:
                 for preco in precos.findall('preco'):
                     try:
                         price = PropertyPrice(
-                            amount=Decimal(self._get_text(preco, 'quantidade', '0')),
-                            currency=self._get_text(preco, 'moeda'),
-                            operation=self._get_text(preco, 'operacao')
+                            amount_cents=int(Decimal(self._get_text(preco, 'quantidade', '0')).scaleb(2)),
+                            currency=self._get_symbol(preco, 'moeda'),
+                            operation=self._get_symbol(preco, 'operacao')
                         )
                         property_obj.prices.append(price)
                     except Exception:
@@ -156,70 +279,89 @@ class RocaXMLParser:
             localizacao = imovel_elem.find('localizacao')
             if localizacao is not None:
                 property_obj.location = PropertyLocation(
-                    postal_code=self._get_text(localizacao, 'codigoPostal'),
+                    postal_code=self._get_symbol(localizacao, 'codigoPostal'),
                     address=self._get_text(localizacao, 'endereco'),
-                    locality=self._get_text(localizacao, 'localidade'),
+                    locality=self._get_symbol(localizacao, 'localidade'),
                     latitude=self._get_text(localizacao, 'latitude'),
                     longitude=self._get_text(localizacao, 'longitude'),
-                    show_map=self._get_text(localizacao, 'mostrarMapa')
+                    show_map=self._get_symbol(localizacao, 'mostrarMapa')
                 )
             
             # Publisher
             publicador = imovel_elem.find('publicador')
             if publicador is not None:
-                property_obj.publisher_code = self._get_text(publicador, 'codigoImobiliaria')
-                property_obj.publisher_name = self._get_text(publicador, 'nomeContato')
-                property_obj.publisher_phone = self._get_text(publicador, 'telefoneContato')
+                property_obj.publisher_code = self._get_symbol(publicador, 'codigoImobiliaria')
+                property_obj.publisher_name = self._get_symbol(publicador, 'nomeContato')
+                property_obj.publisher_phone = self._get_symbol(publicador, 'telefoneContato')
             
             return property_obj
             
         except Exception as e:
-            print(f"Error parsing property: {e}")
+            if offset is not None:
+                print(f"Error parsing property at byte {offset}: {e}")
+            else:
+                print(f"Error parsing property: {e}")
             return None
     
-    def get_statistics(self) -> Dict[str, Any]:
-        """Get statistics about parsed properties"""
-        stats = {
-            'total_properties': len(self.properties),
-            'for_sale': 0,
-            'for_rent': 0,
-            'property_types': {},
-            'total_images': 0,
-            'properties_with_location': 0,
-        }
+    def get_statistics(self, properties: Iterable[Property] = None) -> Dict[str, Any]:
+        """
+        Get statistics about parsed properties (or any property stream)
         
-        for prop in self.properties:
-            # Count sale vs rent
-            for price in prop.prices:
-                if price.operation == 'VENTA':
-                    stats['for_sale'] += 1
-                elif price.operation == 'ALQUILER':
-                    stats['for_rent'] += 1
-            
-            # Count property types
-            if prop.property_type:
-                stats['property_types'][prop.property_type] = \
-                    stats['property_types'].get(prop.property_type, 0) + 1
-            
-            # Count images
-            stats['total_images'] += len(prop.images)
-            
-            # Count properties with location
-            if prop.location and prop.location.address:
-                stats['properties_with_location'] += 1
+        After parse() the statistics gathered during parsing are returned directly.
+        """
+        if properties is None:
+            if self.statistics is not None:
+                return self.statistics
+            properties = self.properties
+        
+        stats = PropertyStatsAggregator()
+        for prop in properties:
+            stats.update(prop)
+        return stats.result()
+    
+    def load_search_index(self, index_path: str = None):
+        """Load the persisted search index of this feed version, building it when missing or stale"""
+        from search_index import PropertySearchIndex, feed_version
+        
+        index_path = index_path or f'{self.file_path}.index.npz'
+        version = feed_version(self.file_path)
+        
+        if os.path.exists(index_path):
+            index = PropertySearchIndex.load(index_path)
+            if index.version == version:
+                self.search_index = index
+                return index
         
-        return stats
+        index = PropertySearchIndex.build(self.properties or self.iter_properties(), version)
+        index.save(index_path)
+        self.search_index = index
+        return index
     
     def search_properties(self, keyword: str = None, 
                          property_type: str = None,
-                         operation: str = None) -> List[Property]:
-        """Search properties by keyword, type, or operation"""
+                         operation: str = None,
+                         properties: Iterable[Property] = None,
+                         top_k: int = None) -> List[Property]:
+        """
+        Search properties by keyword, type, or operation
+        
+        With a search index loaded (load_search_index) and the properties parsed,
+        keywords match whole accent-insensitive words and results come ranked by
+        relevance. Otherwise every property is scanned for the keyword substring.
+        """
+        if properties is None and self.search_index is not None and self.properties:
+            hits = self.search_index.search(keyword, property_type, operation, top_k)
+            return [self.properties[doc_id] for doc_id, _ in hits]
+        
+        if properties is None:
+            properties = self.properties
+        
         results = []
+        keyword_lower = keyword.lower() if keyword else None
         
-        for prop in self.properties:
+        for prop in properties:
             # Check keyword in title or description
-            if keyword:
-                keyword_lower = keyword.lower()
+            if keyword_lower:
                 if (keyword_lower not in prop.title.lower() and 
                     keyword_lower not in prop.description.lower()):
                     continue
@@ -234,12 +376,36 @@ class RocaXMLParser:
                     continue
             
             results.append(prop)
+            if top_k and len(results) >= top_k:
+                break
         
         return results
 
 
+def available_cpus() -> int:
+    """CPUs this process may run on (the affinity mask, when the platform has one)"""
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def _parse_chunk(job: Tuple[str, str, int, int]) -> List[Property]:
+    """Parse every complete Imovel record inside a byte range (process pool worker)"""
+    file_path, encoding, start, end = job
+    parser = RocaXMLParser(file_path)
+    properties = []
+    
+    for offset, record in parser.iter_records(start, end):
+        property_obj = parser.parse_record(record, offset, encoding)
+        if property_obj:
+            properties.append(property_obj)
+    
+    return properties
+
+
 def main():
     """Main function to demonstrate the parser"""
+    import os
     import sys
     
     # File path
@@ -249,7 +415,7 @@ def main():
     parser = RocaXMLParser(xml_file)
     
     try:
-        properties = parser.parse()
+        properties = parser.parse(workers=available_cpus())
         print(f"✓ Successfully parsed {len(properties)} properties\n")
         
         # Show statistics
@@ -260,6 +426,8 @@ def main():
         print(f"For rent: {stats['for_rent']}")
         print(f"Total images: {stats['total_images']}")
         print(f"Properties with location: {stats['properties_with_location']}")
+        if stats['sale_price']['count']:
+            print(f"Median sale price: {stats['sale_price']['quantiles'][0.5]:,.2f}")
         print("\nProperty types:")
         for ptype, count in stats['property_types'].items():
             print(f"  - {ptype}: {count}")
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Inverted Index for Roca Property Search
+Prebuilt, persistent index over accent-folded title/description tokens, with
+posting lists for property type and operation so filters are set intersections.
+"""
+
+import hashlib
+import re
+import unicodedata
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+from parse_roca import Property
+
+
+TOKEN_PATTERN = re.compile(r'\w+')
+
+# BM25 parameters (usual defaults)
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def fold_text(text: str) -> str:
+    """Lowercase and strip accents ('Ótimo Imóvel' -> 'otimo imovel')"""
+    decomposed = unicodedata.normalize('NFKD', text.lower())
+    return ''.join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into accent-folded word tokens"""
+    return TOKEN_PATTERN.findall(fold_text(text))
+
+
+def feed_version(file_path: str) -> str:
+    """Content hash of a feed file, used to know when an index is stale"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(8 * 1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _to_csr(postings: Dict[str, List[int]], values: Dict[str, List[int]] = None):
+    """Pack posting lists into (keys, indptr, doc_ids[, values]) arrays"""
+    keys = sorted(postings)
+    indptr = np.zeros(len(keys) + 1, dtype=np.int64)
+    indptr[1:] = np.cumsum([len(postings[key]) for key in keys])
+    doc_ids = np.fromiter((doc for key in keys for doc in postings[key]),
+                          dtype=np.int32, count=int(indptr[-1]))
+    if values is None:
+        return np.array(keys, dtype=str), indptr, doc_ids
+    tfs = np.fromiter((tf for key in keys for tf in values[key]),
+                      dtype=np.int32, count=int(indptr[-1]))
+    return np.array(keys, dtype=str), indptr, doc_ids, tfs
+
+
+class PropertySearchIndex:
+    """Inverted index over properties, addressed by document id (position in the feed)"""
+
+    def __init__(self, arrays: Dict[str, np.ndarray], version: str = ''):
+        self.version = version
+        self.codes = arrays['codes']
+        self.doc_lengths = arrays['doc_lengths']
+        self.avg_doc_length = float(self.doc_lengths.mean()) if len(self.doc_lengths) else 0.0
+
+        self._term_indptr = arrays['term_indptr']
+        self._term_docs = arrays['term_docs']
+        self._term_tfs = arrays['term_tfs']
+        self._terms = {term: i for i, term in enumerate(arrays['terms'].tolist())}
+
+        self._filters = {}
+        for name in ('type', 'operation'):
+            keys = arrays[f'{name}_keys'].tolist()
+            indptr, docs = arrays[f'{name}_indptr'], arrays[f'{name}_docs']
+            self._filters[name] = {key: docs[indptr[i]:indptr[i + 1]] for i, key in enumerate(keys)}
+
+        self._arrays = arrays
+
+    @classmethod
+    def build(cls, properties: Iterable[Property], version: str = '') -> 'PropertySearchIndex':
+        """Build the index in one pass over a property stream"""
+        term_docs: Dict[str, List[int]] = defaultdict(list)
+        term_tfs: Dict[str, List[int]] = defaultdict(list)
+        type_docs: Dict[str, List[int]] = defaultdict(list)
+        operation_docs: Dict[str, List[int]] = defaultdict(list)
+        codes, doc_lengths = [], []
+
+        for doc_id, prop in enumerate(properties):
+            tokens = tokenize(f'{prop.title} {prop.description}')
+            for term, tf in Counter(tokens).items():
+                term_docs[term].append(doc_id)
+                term_tfs[term].append(tf)
+
+            if prop.property_type:
+                type_docs[prop.property_type].append(doc_id)
+            for operation in {price.operation for price in prop.prices if price.operation}:
+                operation_docs[operation].append(doc_id)
+
+            codes.append(prop.code)
+            doc_lengths.append(len(tokens))
+
+        terms, term_indptr, term_doc_ids, term_tf_values = _to_csr(term_docs, term_tfs)
+        type_keys, type_indptr, type_doc_ids = _to_csr(type_docs)
+        operation_keys, operation_indptr, operation_doc_ids = _to_csr(operation_docs)
+
+        return cls({
+            'codes': np.array(codes, dtype=str),
+            'doc_lengths': np.array(doc_lengths, dtype=np.int32),
+            'terms': terms,
+            'term_indptr': term_indptr,
+            'term_docs': term_doc_ids,
+            'term_tfs': term_tf_values,
+            'type_keys': type_keys,
+            'type_indptr': type_indptr,
+            'type_docs': type_doc_ids,
+            'operation_keys': operation_keys,
+            'operation_indptr': operation_indptr,
+            'operation_docs': operation_doc_ids,
+        }, version)
+
+    def save(self, path: str):
+        """Persist the index as a compressed .npz file"""
+        np.savez_compressed(path, version=np.array(self.version), **self._arrays)
+
+    @classmethod
+    def load(cls, path: str) -> 'PropertySearchIndex':
+        """Load an index saved with save()"""
+        with np.load(path) as data:
+            arrays = {name: data[name] for name in data.files if name != 'version'}
+            version = str(data['version'])
+        return cls(arrays, version)
+
+    def search(self, keyword: str = None, property_type: str = None,
+               operation: str = None, top_k: int = None) -> List[Tuple[int, float]]:
+        """
+        Find documents matching every keyword token and the given filters
+
+        Returns:
+            (doc_id, score) pairs, best BM25 score first when a keyword is given,
+            otherwise in feed order with score 0
+        """
+        candidates = None
+
+        # Filters are plain posting-list intersections
+        for name, value in (('type', property_type), ('operation', operation)):
+            if value:
+                docs = self._filters[name].get(value)
+                if docs is None:
+                    return []
+                candidates = docs if candidates is None else np.intersect1d(candidates, docs,
+                                                                             assume_unique=True)
+
+        terms = list(dict.fromkeys(tokenize(keyword))) if keyword else []
+        term_postings = []
+        for term in terms:
+            term_id = self._terms.get(term)
+            if term_id is None:
+                return []
+            start, end = self._term_indptr[term_id], self._term_indptr[term_id + 1]
+            docs = self._term_docs[start:end]
+            term_postings.append((docs, self._term_tfs[start:end]))
+            candidates = docs if candidates is None else np.intersect1d(candidates, docs,
+                                                                         assume_unique=True)
+
+        if candidates is None:
+            candidates = np.arange(len(self.codes), dtype=np.int32)
+
+        if not term_postings:
+            selected = candidates[:top_k] if top_k else candidates
+            return [(int(doc), 0.0) for doc in selected]
+
+        # BM25 ranking over the surviving candidates
+        n_docs = len(self.codes)
+        lengths = self.doc_lengths[candidates]
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths / max(self.avg_doc_length, 1e-9))
+        scores = np.zeros(len(candidates))
+        for docs, tfs in term_postings:
+            tf = tfs[np.searchsorted(docs, candidates)]
+            idf = np.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            scores += idf * tf * (BM25_K1 + 1) / (tf + norm)
+
+        if top_k and top_k < len(candidates):
+            best = np.argpartition(-scores, top_k)[:top_k]
+        else:
+            best = np.arange(len(candidates))
+        best = best[np.argsort(-scores[best], kind='stable')]
+        return [(int(candidates[i]), float(scores[i])) for i in best]
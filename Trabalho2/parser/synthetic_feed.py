@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Synthetic Roca Feed Generator
+Writes fake roca.xml files of any size, with the same structure as the real feed,
+for benchmarking the parser and exporter.
+"""
+
+import random
+from typing import Any
+from xml.sax.saxutils import escape
+
+
+PROPERTY_TYPES = ['Casa', 'Apartamento', 'Cobertura', 'Terreno', 'Sala Comercial']
+NEIGHBORHOODS = ['Centro', 'Jardim Paraíso', 'Vila Nery', 'Cidade Jardim', 'Santa Felícia',
+                 'Parque Faber', 'Jardim Bethânia', 'Vila Prado']
+CITIES = ['São Carlos', 'São Carlos', 'São Carlos', 'Araraquara', 'Ibaté']
+AMENITIES = ['PISCINA', 'CHURRASQUEIRA', 'ACADEMIA', 'PLAYGROUND', 'SAUNA', 'SALÃO_DE_FESTAS',
+             'QUADRA_POLIESPORTIVA', 'PORTARIA_24_HORAS', 'LAVANDERIA', 'CLOSET', 'ESCRITORIO',
+             'DESPENSA']
+
+
+def _characteristic(char_id: int, name: str, value: Any = '') -> str:
+    return (f'<caracteristica><id>{char_id}</id><nome>{name}</nome>'
+            f'<valor>{value}</valor><idValor></idValor></caracteristica>')
+
+
+def _imovel(rng: random.Random, index: int) -> str:
+    """Build one Imovel record"""
+    property_type = rng.choice(PROPERTY_TYPES)
+    neighborhood = rng.choice(NEIGHBORHOODS)
+    area_util = rng.randint(20, 600)
+
+    characteristics = [
+        _characteristic(1, 'QUARTO', rng.randint(1, 5)),
+        _characteristic(2, 'BANHEIRO', rng.randint(1, 4)),
+        _characteristic(3, 'SUITE', rng.randint(0, 2)),
+        _characteristic(4, 'VAGA', rng.randint(0, 4)),
+        _characteristic(5, 'AREA_UTIL', area_util),
+        _characteristic(6, 'AREA_TOTAL', area_util + rng.randint(0, 400)),
+    ]
+    if rng.random() < 0.5:
+        characteristics.append(_characteristic(7, 'CONDOMINIO', rng.randint(100, 1500)))
+    if rng.random() < 0.7:
+        characteristics.append(_characteristic(8, 'IPTU', rng.randint(50, 800)))
+    for offset, amenity in enumerate(AMENITIES):
+        if rng.random() < 0.3:
+            characteristics.append(_characteristic(100 + offset, amenity, 1))
+
+    prices = []
+    if rng.random() < 0.7:
+        prices.append(f'<preco><quantidade>{rng.randint(80, 3000) * 1000}.00</quantidade>'
+                      f'<moeda>BRL</moeda><operacao>VENTA</operacao></preco>')
+    if not prices or rng.random() < 0.3:
+        prices.append(f'<preco><quantidade>{rng.randint(500, 8000)}.00</quantidade>'
+                      f'<moeda>BRL</moeda><operacao>ALQUILER</operacao></preco>')
+
+    images = ''.join(
+        f'<imagem><urlImagem>https://imagens.roca.example/{index}/{seq}.jpg</urlImagem></imagem>'
+        for seq in range(rng.randint(0, 15))
+    )
+
+    title = f'{property_type} com {area_util} m² no bairro {neighborhood}'
+    description = escape(f'{title}. Ótima localização & acabamento de primeira, '
+                         f'próximo a comércio, escolas e transporte público.')
+
+    return (
+        f'<Imovel>'
+        f'<codigoAnuncio>{index}-S</codigoAnuncio>'
+        f'<codigoReferencia>REF{index:08d}</codigoReferencia>'
+        f'<titulo>{escape(title)}</titulo>'
+        f'<descricao>{description}</descricao>'
+        f'<tipoPropriedade><tipo>{property_type}</tipo><subTipo>Padrão</subTipo></tipoPropriedade>'
+        f'<caracteristicas>{"".join(characteristics)}</caracteristicas>'
+        f'<precos>{"".join(prices)}</precos>'
+        f'<multimidia><imagens>{images}</imagens></multimidia>'
+        f'<localizacao>'
+        f'<codigoPostal>13560-{rng.randint(0, 999):03d}</codigoPostal>'
+        f'<endereco>Rua {rng.randint(1, 2000)}, {rng.randint(1, 3000)}</endereco>'
+        f'<localidade>{neighborhood},{rng.choice(CITIES)}</localidade>'
+        f'<latitude>{-22.0 - rng.random() * 0.1:.6f}</latitude>'
+        f'<longitude>{-47.85 - rng.random() * 0.1:.6f}</longitude>'
+        f'<mostrarMapa>{rng.choice(["S", "N"])}</mostrarMapa>'
+        f'</localizacao>'
+        f'<publicador><codigoImobiliaria>ROCA</codigoImobiliaria>'
+        f'<nomeContato>Roca Imóveis</nomeContato><telefoneContato>(16) 3333-3333</telefoneContato>'
+        f'</publicador>'
+        f'</Imovel>\n'
+    )
+
+
+def generate_feed(file_path: str, n_listings: int, seed: int = 67) -> str:
+    """Write a synthetic feed with n_listings Imovel records and return its path"""
+    rng = random.Random(seed)
+
+    with open(file_path, 'w', encoding='utf-8') as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n<Carga>\n<Imoveis>\n')
+        for index in range(n_listings):
+            f.write(_imovel(rng, index))
+        f.write('</Imoveis>\n</Carga>\n')
+
+    return file_path
+
+
+def main():
+    """Generate a synthetic feed from the command line"""
+    import argparse
+
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument('n_listings', type=int)
+    arg_parser.add_argument('--output', default='roca_synthetic.xml')
+    arg_parser.add_argument('--seed', type=int, default=67)
+    args = arg_parser.parse_args()
+
+    generate_feed(args.output, args.n_listings, args.seed)
+    print(f"✓ Wrote {args.n_listings} listings to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,191 @@
+# Pipeline runner: parse/export -> clean -> fit -> artifacts, with a content-addressed stage cache
+import hashlib
+import inspect
+import json
+import os
+import shutil
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List
+
+
+CACHE_DIR = ".cache/pipeline"
+STATE_FILE = "state.json"
+BUILD_DIR = "build"
+
+
+@dataclass
+class Stage:
+    """
+    One pipeline step
+
+    The cache key of a stage hashes the source of func, its code files, parameters, input
+    files and the keys of the stages it depends on, so a change anywhere upstream makes it stale.
+    """
+    name: str
+    func: Callable[..., Any]
+    outputs: List[str]
+    deps: List[str] = field(default_factory=list)
+    code: List[str] = field(default_factory=list)
+    inputs: List[str] = field(default_factory=list)
+    params: Dict[str, Any] = field(default_factory=dict)
+
+
+def _hash_path(digest, path: str):
+    """Feed a file, or every file under a directory, into digest"""
+    if os.path.isdir(path):
+        for root, dirs, names in os.walk(path):
+            dirs.sort()
+            for name in sorted(names):
+                file_path = os.path.join(root, name)
+                digest.update(os.path.relpath(file_path, path).encode())
+                _hash_path(digest, file_path)
+        return
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(8 * 1024 * 1024), b""):
+            digest.update(chunk)
+
+
+def _hash_outputs(paths: List[str]) -> str | None:
+    """Content hash of a stage's outputs, None when any of them is missing"""
+    digest = hashlib.blake2b(digest_size=16)
+    for path in paths:
+        if not os.path.exists(path):
+            return None
+        digest.update(path.encode())
+        _hash_path(digest, path)
+    return digest.hexdigest()
+
+
+def _copy(src: str, dst: str):
+    """Copy a file or directory, replacing whatever is at dst"""
+    if os.path.isdir(dst):
+        shutil.rmtree(dst)
+    elif os.path.exists(dst):
+        os.remove(dst)
+    if os.path.dirname(dst):
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+    if os.path.isdir(src):
+        shutil.copytree(src, dst)
+    else:
+        shutil.copy2(src, dst)
+
+
+class Pipeline:
+    """Runs stages in dependency order, concurrently when independent, skipping cached ones"""
+
+    def __init__(self, stages: List[Stage], cache_dir: str = CACHE_DIR):
+        self.stages = {stage.name: stage for stage in stages}
+        self.cache_dir = cache_dir
+        self.state_path = os.path.join(cache_dir, STATE_FILE)
+
+    def stage_key(self, name: str, keys: Dict[str, str]) -> str:
+        """Content hash of a stage's code, parameters, input files and upstream keys"""
+        stage = self.stages[name]
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(name.encode())
+        digest.update(inspect.getsource(stage.func).encode())
+        for path in stage.code + stage.inputs:
+            digest.update(path.encode())
+            _hash_path(digest, path)
+        digest.update(json.dumps(stage.params, sort_keys=True, default=str).encode())
+        for dep in stage.deps:
+            digest.update(keys[dep].encode())
+        return digest.hexdigest()
+
+    def run(self, workers: int = os.cpu_count() or 1, force: bool = False) -> Dict[str, str]:
+        """
+        Bring every stage output up to date
+
+        Returns:
+            Status of each stage: 'cached', 'restored' (copied back from the cache) or 'ran'
+        """
+        state = self._load_state()
+        keys: Dict[str, str] = {}
+        status: Dict[str, str] = {}
+        pending = dict(self.stages)
+        running = {}
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            while pending or running:
+                # Start every stage whose dependencies are done; a cached stage can unblock
+                # stages listed before it, so passes repeat until none can start
+                started = True
+                while started:
+                    started = False
+                    for name, stage in list(pending.items()):
+                        if any(dep not in keys for dep in stage.deps):
+                            continue
+                        del pending[name]
+                        started = True
+                        key = self.stage_key(name, keys)
+                        entry = os.path.join(self.cache_dir, name, key)
+
+                        if not force and self._is_current(state.get(name), key, stage.outputs):
+                            keys[name], status[name] = key, "cached"
+                        elif not force and os.path.isdir(entry):
+                            for i, path in enumerate(stage.outputs):
+                                _copy(os.path.join(entry, str(i)), path)
+                            keys[name], status[name] = key, "restored"
+                        else:
+                            print(f"Running {name}...")
+                            running[pool.submit(stage.func, **stage.params)] = (name, key)
+                            continue
+                        state[name] = {'key': key, 'outputs': _hash_outputs(stage.outputs)}
+                        print(f"✓ {name}: {status[name]}")
+
+                if not running:
+                    if pending:
+                        raise ValueError(f"Unresolvable stage dependencies: {sorted(pending)}")
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name, key = running.pop(future)
+                    future.result()
+                    self._store(name, key)
+                    keys[name], status[name] = key, "ran"
+                    state[name] = {'key': key, 'outputs': _hash_outputs(self.stages[name].outputs)}
+                    self._write_state(state)
+                    print(f"✓ {name}: ran")
+
+        self._write_state(state)
+        return status
+
+    @staticmethod
+    def _is_current(entry, key: str, outputs: List[str]) -> bool:
+        """
+        Whether the working tree holds this key's outputs: same key, and outputs whose content
+        is still what the stage wrote (a hand-edited or half-written output is stale)
+        """
+        if not isinstance(entry, dict) or entry.get('key') != key:
+            return False
+        return entry.get('outputs') is not None and _hash_outputs(outputs) == entry['outputs']
+
+    def _store(self, name: str, key: str):
+        """Copy a stage's outputs into its cache entry"""
+        entry = os.path.join(self.cache_dir, name, key)
+        tmp_entry = entry + ".tmp"
+        if os.path.exists(tmp_entry):
+            shutil.rmtree(tmp_entry)
+        for i, path in enumerate(self.stages[name].outputs):
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"Stage {name} did not write {path}")
+            _copy(path, os.path.join(tmp_entry, str(i)))
+        if os.path.exists(entry):
+            shutil.rmtree(entry)
+        os.replace(tmp_entry, entry)
+
+    def _load_state(self) -> Dict[str, dict]:
+        """Key and output hash of the outputs currently in the working tree, per stage"""
+        if not os.path.exists(self.state_path):
+            return {}
+        with open(self.state_path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def _write_state(self, state: Dict[str, dict]):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp_path, self.state_path)
@@ -0,0 +1,337 @@
+# Local HTTP prediction service over ModelInterface, with micro-batching of concurrent requests
+import asyncio
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from http import HTTPStatus
+
+import numpy as np
+import pandas as pd
+
+
+DEFAULT_PORT = 8765
+# Requests arriving within the window (or until the batch is full) share one model call
+BATCH_WINDOW_MS = 5
+MAX_BATCH_RECORDS = 512
+LATENCY_SAMPLES = 10_000
+
+
+# Model work runs in worker processes, each with its own ModelInterface following the model registry
+_interface = None
+
+
+def _get_interface():
+    global _interface
+    if _interface is None:
+        from model_interface import LiveModelInterface
+        _interface = LiveModelInterface()
+    return _interface
+
+
+def _records(frame: pd.DataFrame) -> list[dict]:
+    """Rows as JSON-ready dicts (NaN as None)"""
+    return json.loads(frame.to_json(orient="records"))
+
+
+def _batched(requests: list[list[dict]], required: list[str], predict) -> list:
+    """
+    One predict call over the records of every request that has all the required columns
+
+    Requests are validated one by one before being merged, so a record missing a column
+    (NaN after the merge) cannot borrow the columns of other requests. Returns per request
+    its results, or a ValueError naming the missing columns.
+    """
+    outputs = [None] * len(requests)
+    valid = []
+    for i, records in enumerate(requests):
+        missing = sorted({name for record in records for name in required if name not in record})
+        if missing:
+            outputs[i] = ValueError(f"Faltam colunas obrigatórias: {missing}")
+        else:
+            valid.append(i)
+    if valid:
+        results = predict([record for i in valid for record in requests[i]])
+        start = 0
+        for i in valid:
+            outputs[i] = results[start:start + len(requests[i])]
+            start += len(requests[i])
+    return outputs
+
+
+def predict_sale(requests: list[list[dict]], alpha: float) -> list:
+    """Sale predictions of every model for each record of each request: {model: {mean, ..., obs_ci_upper}}"""
+    interface = _get_interface().current
+
+    def predict(records):
+        predictions = interface.get_predictions(pd.DataFrame.from_records(records), alpha)
+        rows = {model: _records(frame) for model, frame in predictions.items()}
+        return [{model: rows[model][i] for model in rows} for i in range(len(records))]
+
+    return _batched(requests, interface.sale_features, predict)
+
+
+def predict_rent(requests: list[list[dict]], alpha: float) -> list:
+    """Rent predictions with conformal intervals for each record of each request: {mean, obs_ci_lower, obs_ci_upper}"""
+    interface = _get_interface().current
+    return _batched(requests, interface.rent_trees.feature_names,
+                    lambda records: _records(interface.predict_rent_interval(pd.DataFrame.from_records(records), alpha)))
+
+
+class ServiceStats:
+    """Request/batch counters and a window of recent request latencies"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.requests = 0
+        self.records = 0
+        self.batches = 0
+        self.errors = 0
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+
+    def snapshot(self) -> dict:
+        uptime = time.perf_counter() - self.started
+        latencies = np.array(self.latencies) * 1000
+        percentiles = {f"p{q}_ms": float(np.percentile(latencies, q)) if len(latencies) else None
+                       for q in (50, 95, 99)}
+        return {
+            'uptime_seconds': uptime,
+            'requests': self.requests,
+            'records': self.records,
+            'batches': self.batches,
+            'errors': self.errors,
+            'records_per_batch': self.records / self.batches if self.batches else None,
+            'requests_per_second': self.requests / uptime if uptime else None,
+            **percentiles,
+        }
+
+
+class MicroBatcher:
+    """
+    Collects the records of concurrent requests into one call of func
+
+    A batch is dispatched BATCH_WINDOW_MS after its first request or as soon as it reaches
+    MAX_BATCH_RECORDS; batches run in the worker pool while the next one is collected.
+    """
+
+    def __init__(self, func, executor, stats: ServiceStats, alpha: float,
+                 window_ms: float = BATCH_WINDOW_MS, max_records: int = MAX_BATCH_RECORDS):
+        self.func = func
+        self.executor = executor
+        self.stats = stats
+        self.alpha = alpha
+        self.window = window_ms / 1000
+        self.max_records = max_records
+        self.queue: asyncio.Queue = asyncio.Queue()
+
+    async def submit(self, records: list[dict]) -> list[dict]:
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((records, future))
+        return await future
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            size = len(batch[0][0])
+            deadline = loop.time() + self.window
+            while size < self.max_records:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                batch.append(item)
+                size += len(item[0])
+            loop.create_task(self._dispatch(batch))
+
+    async def _dispatch(self, batch: list):
+        self.stats.batches += 1
+        try:
+            results = await asyncio.get_running_loop().run_in_executor(
+                self.executor, self.func, [request_records for request_records, _ in batch], self.alpha)
+        except Exception as error:
+            if len(batch) == 1:
+                _resolve(batch[0][1], error)
+            else:
+                # A bad record fails the whole call, so each request is retried on its own
+                await asyncio.gather(*(self._dispatch([item]) for item in batch))
+            return
+        for (_, future), result in zip(batch, results):
+            _resolve(future, result)
+
+
+def _resolve(future: asyncio.Future, result):
+    """Set a request's result (or exception), unless its client already went away"""
+    if future.cancelled():
+        return
+    if isinstance(result, Exception):
+        future.set_exception(result)
+    else:
+        future.set_result(result)
+
+
+class PredictionService:
+    """
+    HTTP/1.1 JSON endpoints (keep-alive):
+        POST /predict/sale, POST /predict/rent: a record or a list of records
+        GET /stats: ServiceStats counters; GET /health
+    """
+
+    def __init__(self, workers: int = os.cpu_count() or 1, alpha: float = 0.05,
+                 window_ms: float = BATCH_WINDOW_MS, max_records: int = MAX_BATCH_RECORDS):
+        self.workers = workers
+        # Every worker loads the models in its initializer, before it takes any batch
+        self.executor = ProcessPoolExecutor(max_workers=workers, initializer=_warm_up)
+        self.stats = ServiceStats()
+        self.batchers = {
+            "/predict/sale": MicroBatcher(predict_sale, self.executor, self.stats, alpha, window_ms, max_records),
+            "/predict/rent": MicroBatcher(predict_rent, self.executor, self.stats, alpha, window_ms, max_records),
+        }
+
+    async def serve(self, host: str = "127.0.0.1", port: int = DEFAULT_PORT):
+        # Start the pool (and so the warm-up of its workers) before accepting requests
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self.executor, _warm_up)
+        for batcher in self.batchers.values():
+            loop.create_task(batcher.run())
+        server = await asyncio.start_server(self.handle, host, port)
+        print(f"✓ Serving predictions on http://{host}:{port}")
+        async with server:
+            await server.serve_forever()
+
+    async def route(self, method: str, path: str, body: bytes) -> tuple[HTTPStatus, object]:
+        if method == "GET" and path == "/health":
+            return HTTPStatus.OK, {'status': "ok"}
+        if method == "GET" and path == "/stats":
+            return HTTPStatus.OK, self.stats.snapshot()
+        if path not in self.batchers:
+            return HTTPStatus.NOT_FOUND, {'error': f"Unknown endpoint {path}"}
+        if method != "POST":
+            return HTTPStatus.METHOD_NOT_ALLOWED, {'error': "Use POST"}
+
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            return HTTPStatus.BAD_REQUEST, {'error': "Invalid JSON"}
+        records = payload if isinstance(payload, list) else [payload]
+        if not records or not all(isinstance(record, dict) for record in records):
+            return HTTPStatus.BAD_REQUEST, {'error': "Expected a record or a list of records"}
+
+        start = time.perf_counter()
+        self.stats.requests += 1
+        self.stats.records += len(records)
+        try:
+            results = await self.batchers[path].submit(records)
+        except Exception as error:
+            self.stats.errors += 1
+            return HTTPStatus.UNPROCESSABLE_ENTITY, {'error': str(error)}
+        self.stats.latencies.append(time.perf_counter() - start)
+        return HTTPStatus.OK, results if isinstance(payload, list) else results[0]
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, path, _ = request_line.decode("latin-1").split()
+                headers = {}
+                while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+
+                status, payload = await self.route(method, path, body)
+                data = json.dumps(payload).encode()
+                writer.write(f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                             f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\n\r\n".encode() + data)
+                await writer.drain()
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+
+def _warm_up():
+    """Load every model of the worker's ModelInterface (pool initializer)"""
+    _get_interface().current.warm_up()
+
+
+async def _client(host: str, port: int, path: str, bodies: list[bytes], latencies: list[float]):
+    """Send bodies one after another on a keep-alive connection"""
+    reader, writer = await asyncio.open_connection(host, port)
+    for body in bodies:
+        start = time.perf_counter()
+        writer.write(f"POST {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+                     f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
+        await writer.drain()
+        status = await reader.readline()
+        length = 0
+        while (line := await reader.readline()) not in (b"\r\n", b""):
+            if line.lower().startswith(b"content-length:"):
+                length = int(line.split(b":")[1])
+        await reader.readexactly(length)
+        if not status.startswith(b"HTTP/1.1 200"):
+            raise RuntimeError(f"Request failed: {status.decode().strip()}")
+        latencies.append(time.perf_counter() - start)
+    writer.close()
+
+
+async def load_test(host: str = "127.0.0.1", port: int = DEFAULT_PORT, kind: str = "sell",
+                    requests: int = 2000, concurrency: int = 32) -> dict:
+    """Single-record requests from the clean data, sent by concurrency clients"""
+    from clean_data import load_clean_data
+
+    data = load_clean_data(kind)
+    rows = _records(data.sample(requests, replace=True, random_state=0))
+    bodies = [json.dumps(row).encode() for row in rows]
+    path = "/predict/sale" if kind == "sell" else "/predict/rent"
+
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*(_client(host, port, path, bodies[i::concurrency], latencies)
+                           for i in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        'requests': len(latencies),
+        'seconds': elapsed,
+        'requests_per_second': len(latencies) / elapsed,
+        **{f"p{q}_ms": float(np.percentile(latencies_ms, q)) for q in (50, 95, 99)},
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    arg_parser = argparse.ArgumentParser(description="Local prediction service over ModelInterface")
+    commands = arg_parser.add_subparsers(dest="command", required=True)
+    serve_parser = commands.add_parser("serve", help="Run the service")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    serve_parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    serve_parser.add_argument("--alpha", type=float, default=0.05)
+    serve_parser.add_argument("--window-ms", type=float, default=BATCH_WINDOW_MS)
+    serve_parser.add_argument("--max-batch", type=int, default=MAX_BATCH_RECORDS)
+    load_parser = commands.add_parser("load-test", help="Benchmark a running service")
+    load_parser.add_argument("--host", default="127.0.0.1")
+    load_parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    load_parser.add_argument("--kind", choices=["sell", "rent"], default="sell")
+    load_parser.add_argument("--requests", type=int, default=2000)
+    load_parser.add_argument("--concurrency", type=int, default=32)
+    args = arg_parser.parse_args()
+
+    if args.command == "serve":
+        service = PredictionService(args.workers, args.alpha, args.window_ms, args.max_batch)
+        asyncio.run(service.serve(args.host, args.port))
+    else:
+        report = asyncio.run(load_test(args.host, args.port, args.kind, args.requests, args.concurrency))
+        print(f"✓ {report['requests']} requests in {report['seconds']:.2f} s "
+              f"({report['requests_per_second']:.0f} req/s)")
+        print(f"✓ Latency p50 {report['p50_ms']:.1f} ms, p95 {report['p95_ms']:.1f} ms, p99 {report['p99_ms']:.1f} ms")
@@ -0,0 +1,277 @@
+# Model fitting from modelling.ipynb available as a script
+import json
+import re
+from typing import TYPE_CHECKING
+
+import numpy as np
+import pandas as pd
+
+from clean_data import to_numpy_dtypes
+
+# scipy, statsmodels, scikit-learn and xgboost are imported where they are used:
+# model_interface.py only needs the artifact helpers here and should start fast
+if TYPE_CHECKING:
+    from xgboost import XGBRegressor
+
+
+SEED = 67
+
+# Standardization parameters computed at training time and read by model_interface.py
+STANDARDIZATION_FILE = "models/standardization.json"
+STANDARDIZATION_VERSION = 1
+
+# Calibration residuals of the XGBoost models, for split-conformal intervals
+CONFORMAL_FILE = "models/conformal_residuals.npz"
+
+SALE_FORMULA = ("sale_price ~ bedrooms + bathrooms + parking_spaces + area_total + C(property_type) + "
+                "condominium_fee + has_pool + has_bbq + has_playground +has_sauna + has_party_room + "
+                "has_sports_court + has_24h_security + has_laundry + has_closet + has_office + has_pantry + "
+                "amenity_score")
+
+BASE_XGB_PARAMS = {
+    'device': 'cpu',  # GPU is hard to configure
+    'tree_method': 'hist',
+    'enable_categorical': True,
+    'n_jobs': 1,
+    'verbosity': 1
+}
+
+# Best parameters found by the random searches in modelling.ipynb.
+# The sale search only left its number of trees and depth in models/xgb_model.json
+XGB_SALE_PARAMS = {
+    'random_state': SEED,
+    'n_estimators': 294,
+    'max_depth': 6,
+}
+XGB_RENT_PARAMS = {
+    'random_state': 124,
+    'colsample_bytree': 0.6693052555378327,
+    'gamma': 3.0799935520363486,
+    'learning_rate': 0.03485363689000953,
+    'max_depth': 12,
+    'min_child_weight': 1,
+    'n_estimators': 140,
+    'reg_alpha': 0.6524073675088871,
+    'reg_lambda': 3.8490940245272522,
+    'subsample': 0.5217883827462502,
+}
+
+
+def _trimmed_stats(series: pd.Series, limit: float) -> dict:
+    """Trimmed mean/std (values above limit ignored), used to reduce influence of big outliers and asymmetry"""
+    import scipy.stats as ss
+
+    return {
+        'mean': float(ss.tmean(series, limits=(None, limit))),
+        'std': float(ss.tstd(series, limits=(None, limit))),
+        'limit': float(limit),
+    }
+
+
+def fit_standardization(full_data: pd.DataFrame) -> dict:
+    """
+    Standardization parameters of the sale models (see modelling.ipynb)
+
+    Areas and condominium fee use fixed trim limits; the other numeric columns are
+    trimmed at their 0.99 quantile, computed without the area_total outlier.
+    """
+    import scipy.stats as ss
+
+    data = to_numpy_dtypes(full_data)
+    columns = {
+        "area_util": _trimmed_stats(data["area_util"], 1000),
+        "area_total": _trimmed_stats(data["area_total"], 1000),
+        "condominium_fee": _trimmed_stats(data["condominium_fee"], 1700),
+    }
+    std_area_total = (data["area_total"] - columns["area_total"]["mean"]) / columns["area_total"]["std"]
+    data = data[std_area_total < 10000]
+
+    num_cols = data.select_dtypes(include="number").drop(
+        columns=["sale_price", "area_util", "area_total", "condominium_fee"]).columns
+    for col in num_cols:
+        columns[col] = _trimmed_stats(data[col], ss.quantile(data[col], 0.99))
+
+    return {
+        'version': STANDARDIZATION_VERSION,
+        'columns': columns,
+        'exp_columns': ["area_util", "area_total"],
+    }
+
+
+def apply_standardization(df: pd.DataFrame, params: dict) -> pd.DataFrame:
+    """Standardize the columns of df present in params and add the exponential area features"""
+    std = to_numpy_dtypes(df)
+    for col, stats in params['columns'].items():
+        if col in std.columns:
+            std[col] = (std[col] - stats['mean']) / stats['std']
+    for col in params['exp_columns']:
+        if col in std.columns:
+            std[f"exp({col})"] = np.exp(std[col])
+    return std
+
+
+def save_standardization(params: dict, path: str = STANDARDIZATION_FILE):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(params, f, indent=2)
+
+
+def load_standardization(path: str = STANDARDIZATION_FILE) -> dict:
+    """Standardization parameters saved by save_standardization"""
+    with open(path, encoding="utf-8") as f:
+        params = json.load(f)
+    if params.get('version') != STANDARDIZATION_VERSION:
+        raise ValueError(f"Unsupported standardization version {params.get('version')} in {path}")
+    return params
+
+
+def standardize(full_data: pd.DataFrame, params: dict | None = None) -> pd.DataFrame:
+    """Training frame of the sale models: standardized features, sale price in 10^5 units, outlier removed"""
+    params = params or fit_standardization(full_data)
+    std_data = apply_standardization(full_data, params)
+    # To avoid exploding values
+    std_data["sale_price"] = std_data["sale_price"] / 10**5
+    return std_data.query("area_total < 10000")
+
+
+def split(data: pd.DataFrame, seed: int = SEED) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Train/test split used by every model"""
+    from sklearn.model_selection import train_test_split
+
+    return train_test_split(data, test_size=0.2, random_state=seed)
+
+
+def fit_ols(train: pd.DataFrame):
+    """Baseline linear model for the sale price"""
+    import statsmodels.formula.api as smf
+
+    return smf.ols(formula=SALE_FORMULA, data=train).fit()
+
+
+def fit_gamma(train: pd.DataFrame):
+    """Gamma GLM with identity link for the sale price"""
+    import statsmodels.formula.api as smf
+    import statsmodels.genmod.families.family as family
+    import statsmodels.genmod.families.links as links
+
+    return smf.glm(formula=SALE_FORMULA, data=train, family=family.Gamma(link=links.Identity())).fit()
+
+
+def xgb_sale_features(df: pd.DataFrame) -> tuple[pd.DataFrame, pd.Series]:
+    """Features and target of the sale XGBoost model, returns X, Y"""
+    df = df.drop(columns="property_code")
+    num = df.select_dtypes(include="number").drop(columns=["sale_price", "exp(area_util)", "exp(area_total)"])
+    boolean = df.select_dtypes(include="boolean")
+    cat = df.select_dtypes(include=["object", "category"]).astype("category")
+    return pd.concat([num, boolean, cat], axis=1), df["sale_price"]
+
+
+def xgb_rent_features(df: pd.DataFrame) -> tuple[pd.DataFrame, pd.Series]:
+    """Features and target of the rent XGBoost model, returns X, Y"""
+    df = df.drop(columns="property_code")
+    num = df.select_dtypes(include="number").drop(columns=["rent_price", "amenity_score"])
+    boolean = df.select_dtypes(include="boolean")
+    cat = df.select_dtypes(include=["object", "category"]).drop(
+        columns=["property_subtype", "size_category"]).astype("category")
+    return pd.concat([num, boolean, cat], axis=1), df["rent_price"]
+
+
+def fit_xgb(X: pd.DataFrame, Y: pd.Series, params: dict) -> "XGBRegressor":
+    """XGBoost regressor with the repo's base parameters"""
+    from xgboost import XGBRegressor
+
+    model = XGBRegressor(**BASE_XGB_PARAMS, **params)
+    model.fit(X, Y)
+    return model
+
+
+def regression_metrics(y_true, y_pred) -> dict:
+    """Test metrics reported in modelling.ipynb"""
+    from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+
+    mse = float(mean_squared_error(y_true, y_pred))
+    return {
+        'mse': mse,
+        'rmse': mse ** 0.5,
+        'mae': float(mean_absolute_error(y_true, y_pred)),
+        'r2': float(r2_score(y_true, y_pred)),
+    }
+
+
+def conformal_residuals(model: "XGBRegressor", X: pd.DataFrame, Y: pd.Series) -> np.ndarray:
+    """Sorted absolute residuals on data the model was not trained on (calibration set)"""
+    return np.sort(np.abs(Y.to_numpy(dtype=float) - model.predict(X)))
+
+
+def conformal_quantile(residuals: np.ndarray, alpha: float = 0.05) -> float:
+    """
+    Half-width of the split-conformal interval with coverage 1 - alpha
+
+    The ceil((n + 1)(1 - alpha))-th smallest residual; infinite when the calibration
+    set is too small for that coverage.
+    """
+    rank = int(np.ceil((len(residuals) + 1) * (1 - alpha)))
+    return float(residuals[rank - 1]) if rank <= len(residuals) else np.inf
+
+
+def fit_conformal(sale_model: "XGBRegressor", rent_model: "XGBRegressor",
+                  sell_data: pd.DataFrame, rent_data: pd.DataFrame) -> dict:
+    """Calibration residuals of both XGBoost models on their held-out test splits"""
+    _, sale_test = split(standardize(sell_data))
+    _, rent_test = split(rent_data)
+    sale_X, sale_Y = xgb_sale_features(sale_test)
+    rent_X, rent_Y = xgb_rent_features(to_numpy_dtypes(rent_test))
+    return {
+        'sale': conformal_residuals(sale_model, sale_X, sale_Y),
+        'rent': conformal_residuals(rent_model, rent_X[rent_model.get_booster().feature_names], rent_Y),
+    }
+
+
+def save_conformal(residuals: dict, path: str = CONFORMAL_FILE):
+    np.savez(path, **residuals)
+
+
+def load_conformal(path: str = CONFORMAL_FILE) -> dict:
+    with np.load(path) as data:
+        return {name: data[name] for name in data.files}
+
+
+def slim_results(results, path: str):
+    """
+    Save fitted OLS/GLM results without their training data
+
+    Only what prediction needs is kept: parameters, covariance, scale and enough of the
+    training frame for statsmodels to rebuild the patsy design info when loading
+    (one row per level of every categorical or boolean column).
+    """
+    # The scale is computed lazily from the residuals, so cache it while they are still there
+    results.scale
+    results.remove_data()
+
+    data = results.model.data
+    frame = data.frame[[column for column in data.frame.columns
+                        if re.search(rf"\b{re.escape(column)}\b", data.formula)]]
+    keep = set()
+    for column in frame.columns:
+        if frame[column].dtype.kind not in "iufc":
+            keep.update(frame[column].drop_duplicates().index)
+    # remove_data keeps the original frames of formula models
+    data.frame = frame[frame.index.isin(keep)]
+    for attr in ("orig_endog", "orig_exog"):
+        value = getattr(data, attr, None)
+        if value is not None:
+            setattr(data, attr, value[value.index.isin(keep)])
+    results.save(path)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    arg_parser = argparse.ArgumentParser(description="Slim saved statsmodels results for serving")
+    arg_parser.add_argument("paths", nargs="+", help="Pickled OLS/GLM results, rewritten in place")
+    args = arg_parser.parse_args()
+
+    from statsmodels.base.wrapper import ResultsWrapper
+
+    for path in args.paths:
+        slim_results(ResultsWrapper.load(path), path)
+        print(f"✓ Slimmed {path}")
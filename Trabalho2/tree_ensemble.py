@@ -0,0 +1,159 @@
+# XGBoost models (saved JSON) scored with NumPy, for single records and small batches
+import json
+
+import numpy as np
+import pandas as pd
+
+
+def _decode_categories(enc: dict) -> list[tuple[str, int]]:
+    """
+    Category names of one feature, stored by xgboost as signed UTF-8 bytes plus offsets
+
+    The offsets count characters while the bytes are cut at that same count, so names with
+    non-ASCII characters shift the rest and the last names lose their end. Returns
+    (name, length) pairs: a name shorter than its length is a prefix of the real one.
+    """
+    text = bytes(value & 0xFF for value in enc['values']).decode("utf-8", errors="ignore")
+    offsets = enc['offsets']
+    return [(text[offsets[i]:offsets[i + 1]], offsets[i + 1] - offsets[i]) for i in range(len(offsets) - 1)]
+
+
+class TreeEnsemble:
+    """
+    Tree ensemble of a regression XGBoost model as flat node arrays
+
+    Every tree is stored in the same arrays (children as global node indices, leaves pointing
+    to themselves), so all trees advance one level per step for all rows at once. Numeric
+    splits go left when value < threshold (float32, as xgboost), categorical splits go right
+    when the category is in the node's set, and missing values follow default_left.
+    """
+
+    def __init__(self, feature_names: list[str], feature_types: list[str], categories: dict,
+                 base_score: float, roots: np.ndarray, left: np.ndarray, right: np.ndarray,
+                 feature: np.ndarray, threshold: np.ndarray, default_left: np.ndarray,
+                 value: np.ndarray, cat_row: np.ndarray, cat_sets: np.ndarray, depth: int):
+        self.feature_names = feature_names
+        self.feature_types = feature_types
+        # Category name -> code used in training, per categorical feature; names saved truncated
+        # are matched by prefix and length (see _decode_categories)
+        self.categories = {name: {category: code for code, (category, length) in enumerate(values)
+                                  if len(category) == length}
+                           for name, values in categories.items()}
+        self._truncated = {name: [(category, length, code) for code, (category, length) in enumerate(values)
+                                  if len(category) != length]
+                           for name, values in categories.items()}
+        self.base_score = base_score
+        self.roots = roots
+        self.left = left
+        self.right = right
+        self.feature = feature
+        self.threshold = threshold
+        self.default_left = default_left
+        self.value = value
+        # Row of cat_sets of each categorical split node, -1 for numeric splits
+        self.cat_row = cat_row
+        self.cat_sets = cat_sets
+        self.depth = depth
+
+    @classmethod
+    def load(cls, path: str) -> "TreeEnsemble":
+        """Read a model saved with XGBRegressor.save_model (JSON, gbtree, single target)"""
+        with open(path, encoding="utf-8") as f:
+            learner = json.load(f)['learner']
+        booster = learner['gradient_booster']
+        if booster['name'] != "gbtree" or learner['objective']['name'] != "reg:squarederror":
+            raise ValueError(f"Only gbtree models with reg:squarederror are supported: {path}")
+        model = booster['model']
+
+        feature_names = learner['feature_names']
+        feature_types = learner['feature_types']
+        categories = {}
+        if 'cats' in model:
+            for name, enc in zip(feature_names, model['cats']['enc']):
+                if enc['offsets']:
+                    categories[name] = _decode_categories(enc)
+
+        roots, left, right, feature, threshold, default_left, value = [], [], [], [], [], [], []
+        cat_nodes, cat_values = [], []
+        depth = 0
+        offset = 0
+        for tree in model['trees']:
+            tree_left = np.asarray(tree['left_children'], dtype=np.int64)
+            tree_right = np.asarray(tree['right_children'], dtype=np.int64)
+            nodes = np.arange(len(tree_left))
+            leaf = tree_left == -1
+            # Leaves point to themselves, so extra steps leave finished rows in place
+            left.append(np.where(leaf, nodes, tree_left) + offset)
+            right.append(np.where(leaf, nodes, tree_right) + offset)
+            feature.append(np.where(leaf, 0, tree['split_indices']))
+            threshold.append(np.asarray(tree['split_conditions'], dtype=np.float32))
+            default_left.append(np.asarray(tree['default_left'], dtype=bool))
+            value.append(np.where(leaf, tree['split_conditions'], 0.0))
+            roots.append(offset)
+
+            segments, sizes = tree['categories_segments'], tree['categories_sizes']
+            for node, start, size in zip(tree['categories_nodes'], segments, sizes):
+                cat_nodes.append(offset + node)
+                cat_values.append(tree['categories'][start:start + size])
+
+            node_depth = np.zeros(len(tree_left), dtype=np.int64)
+            for node in range(len(tree_left)):
+                if not leaf[node]:
+                    node_depth[tree_left[node]] = node_depth[tree_right[node]] = node_depth[node] + 1
+            depth = max(depth, int(node_depth.max()))
+            offset += len(tree_left)
+
+        cat_row = np.full(offset, -1, dtype=np.int64)
+        width = max((max(values, default=-1) + 1 for values in cat_values), default=1)
+        cat_sets = np.zeros((max(len(cat_nodes), 1), width), dtype=bool)
+        for row, (node, values) in enumerate(zip(cat_nodes, cat_values)):
+            cat_row[node] = row
+            cat_sets[row, values] = True
+
+        base_score = float(learner['learner_model_param']['base_score'].strip("[]"))
+        return cls(feature_names, feature_types, categories, base_score, np.asarray(roots, dtype=np.int64),
+                   np.concatenate(left), np.concatenate(right), np.concatenate(feature).astype(np.int64),
+                   np.concatenate(threshold), np.concatenate(default_left), np.concatenate(value),
+                   cat_row, cat_sets, depth)
+
+    def features(self, df: pd.DataFrame) -> np.ndarray:
+        """Feature matrix in the model's column order; categories as training codes, NaN if missing/unknown"""
+        missing = [name for name in self.feature_names if name not in df.columns]
+        if missing:
+            raise ValueError(f"Faltam colunas obrigatórias: {missing}")
+        X = np.empty((len(df), len(self.feature_names)), dtype=np.float32)
+        for j, name in enumerate(self.feature_names):
+            if name in self.categories:
+                codes = self.categories[name]
+                X[:, j] = [codes[category] if category in codes else self._category_code(name, category)
+                           for category in df[name].astype(object)]
+            else:
+                X[:, j] = np.asarray(df[name], dtype=np.float32)
+        return X
+
+    def _category_code(self, name: str, category) -> float:
+        """Training code of a category missing from the exact names (NaN when unknown)"""
+        if isinstance(category, str):
+            for prefix, length, code in self._truncated[name]:
+                if len(category) == length and category.startswith(prefix):
+                    self.categories[name][category] = code
+                    return code
+        return np.nan
+
+    def predict(self, df: pd.DataFrame) -> np.ndarray:
+        """Predictions for every row of df, same as XGBRegressor.predict up to float rounding"""
+        X = self.features(df)
+        rows = np.arange(len(X))[:, None]
+        node = np.broadcast_to(self.roots, (len(X), len(self.roots)))
+        for _ in range(self.depth):
+            x = X[rows, self.feature[node]]
+            cat_row = self.cat_row[node]
+            is_cat = cat_row >= 0
+            # Categorical split: in the set goes right (codes outside the set's width are not in it)
+            code = np.where(is_cat & ~np.isnan(x), x, -1).astype(np.int64)
+            in_range = (code >= 0) & (code < self.cat_sets.shape[1])
+            in_set = in_range & self.cat_sets[np.maximum(cat_row, 0), np.where(in_range, code, 0)]
+            go_left = np.where(is_cat, ~in_set, x < self.threshold[node])
+            go_left = np.where(np.isnan(x), self.default_left[node], go_left)
+            node = np.where(go_left, self.left[node], self.right[node])
+        return (self.base_score + self.value[node].sum(axis=1)).astype(np.float32)
@@ -0,0 +1,189 @@
+# XGBoost hyperparameter search from modelling.ipynb as a script: successive halving over
+# cached per-fold DMatrix, trials trained in parallel
+import json
+import math
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import training
+from clean_data import load_clean_data
+
+
+# Distributions of the notebook's RandomizedSearchCV; the number of trees is the halving budget
+SEARCH_SPACE = {
+    'max_depth': ("randint", 3, 15),
+    'learning_rate': ("uniform", 0.001, 0.2),
+    'subsample': ("uniform", 0.5, 0.5),
+    'colsample_bytree': ("uniform", 0.5, 0.5),
+    'gamma': ("uniform", 0, 10),
+    'min_child_weight': ("randint", 1, 10),
+    'reg_lambda': ("uniform", 0, 5),  # L2 regularization
+    'reg_alpha': ("uniform", 0, 2),  # L1 regularization
+}
+
+# Native parameters matching training.BASE_XGB_PARAMS; every trial uses a single thread
+TRIAL_PARAMS = {
+    'objective': "reg:squarederror",
+    'device': "cpu",
+    'tree_method': "hist",
+    'nthread': 1,
+    'verbosity': 0,
+}
+
+N_FOLDS = 3
+MIN_ROUNDS = 50
+MAX_ROUNDS = 350
+HALVING_FACTOR = 3
+EARLY_STOPPING_ROUNDS = 20
+
+# Output paths per target (model, search log)
+OUTPUT_FILES = {
+    'sale': ("models/xgb_model_tuned.json", "models/xgb_search_sale.json"),
+    'rent': ("models/xgb_model_rent_tuned.json", "models/xgb_search_rent.json"),
+}
+
+
+def sample_params(rng: np.random.Generator) -> dict:
+    """One draw from SEARCH_SPACE"""
+    params = {}
+    for name, (kind, low, width) in SEARCH_SPACE.items():
+        if kind == "randint":
+            params[name] = int(rng.integers(low, width))
+        else:
+            params[name] = float(low + width * rng.random())
+    return params
+
+
+def target_data(target: str) -> tuple[pd.DataFrame, pd.Series, pd.DataFrame, pd.Series]:
+    """Train/test features and target of the sale or rent XGBoost model (same split as training.py)"""
+    if target == "sale":
+        train, test = training.split(training.standardize(load_clean_data("sell")))
+        features = training.xgb_sale_features
+    else:
+        train, test = training.split(load_clean_data("rent"))
+        features = training.xgb_rent_features
+    return (*features(train), *features(test))
+
+
+def build_folds(X: pd.DataFrame, Y: pd.Series, n_folds: int = N_FOLDS, seed: int = training.SEED) -> list:
+    """(train, validation) QuantileDMatrix pairs, built once and shared by every trial"""
+    import xgboost as xgb
+    from sklearn.model_selection import KFold
+
+    folds = []
+    for train_idx, valid_idx in KFold(n_folds, shuffle=True, random_state=seed).split(X):
+        dtrain = xgb.QuantileDMatrix(X.iloc[train_idx], Y.iloc[train_idx], enable_categorical=True)
+        dvalid = xgb.QuantileDMatrix(X.iloc[valid_idx], Y.iloc[valid_idx], ref=dtrain, enable_categorical=True)
+        folds.append((dtrain, dvalid))
+    return folds
+
+
+def run_trial(params: dict, fold: tuple, rounds: int, seed: int = training.SEED) -> tuple[float, int]:
+    """Validation RMSE and number of trees of one configuration on one fold, with early stopping"""
+    import xgboost as xgb
+
+    dtrain, dvalid = fold
+    booster = xgb.train({**TRIAL_PARAMS, **params, 'seed': seed, 'eval_metric': "rmse"}, dtrain,
+                        num_boost_round=rounds, evals=[(dvalid, "valid")],
+                        early_stopping_rounds=EARLY_STOPPING_ROUNDS, verbose_eval=False)
+    return float(booster.best_score), int(booster.best_iteration) + 1
+
+
+def successive_halving(folds: list, n_trials: int, workers: int = os.cpu_count() or 1,
+                       seed: int = training.SEED, min_rounds: int = MIN_ROUNDS, max_rounds: int = MAX_ROUNDS,
+                       factor: int = HALVING_FACTOR) -> tuple[dict, list]:
+    """
+    Random search where each rung gives the surviving configurations factor times more trees
+    and keeps the best 1/factor of them (by mean validation RMSE over the folds)
+
+    Returns:
+        The best trial and the log of every trial of every rung
+    """
+    rng = np.random.default_rng(seed)
+    configs = [sample_params(rng) for _ in range(n_trials)]
+    survivors = list(range(n_trials))
+    log = []
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        rung = 0
+        while True:
+            rounds = min(max_rounds, min_rounds * factor ** rung)
+            start = time.perf_counter()
+            futures = {(i, k): pool.submit(run_trial, configs[i], fold, rounds, seed)
+                       for i in survivors for k, fold in enumerate(folds)}
+            trials = []
+            for i in survivors:
+                results = [futures[i, k].result() for k in range(len(folds))]
+                trials.append({
+                    'rung': rung,
+                    'trial': i,
+                    'rounds': rounds,
+                    'params': configs[i],
+                    'rmse': float(np.mean([rmse for rmse, _ in results])),
+                    'best_rounds': int(round(np.mean([trees for _, trees in results]))),
+                })
+            trials.sort(key=lambda trial: trial['rmse'])
+            log.extend(trials)
+            print(f"✓ Rung {rung}: {len(trials)} trials x {len(folds)} folds, {rounds} rounds, "
+                  f"best RMSE {trials[0]['rmse']:.4f} ({time.perf_counter() - start:.1f} s)")
+
+            if len(trials) == 1 or rounds >= max_rounds:
+                return trials[0], log
+            survivors = [trial['trial'] for trial in trials[:math.ceil(len(trials) / factor)]]
+            rung += 1
+
+
+def tune(target: str, n_trials: int = 81, workers: int = os.cpu_count() or 1, seed: int = training.SEED,
+         output: str | None = None, log_output: str | None = None) -> dict:
+    """Search, refit the best configuration on the whole train split and save it with the search log"""
+    start = time.perf_counter()
+    X, Y, X_test, Y_test = target_data(target)
+    folds = build_folds(X, Y, seed=seed)
+    best, log = successive_halving(folds, n_trials, workers, seed)
+    search_seconds = time.perf_counter() - start
+
+    params = {'random_state': seed, 'n_estimators': best['best_rounds'], **best['params']}
+    model = training.fit_xgb(X, Y, params)
+    metrics = training.regression_metrics(Y_test, model.predict(X_test))
+
+    default_output, default_log = OUTPUT_FILES[target]
+    output, log_output = output or default_output, log_output or default_log
+    model.save_model(output)
+    report = {
+        'target': target,
+        'n_trials': n_trials,
+        'workers': workers,
+        'folds': len(folds),
+        'search_seconds': search_seconds,
+        'best_params': params,
+        'validation_rmse': best['rmse'],
+        'test_metrics': metrics,
+        'model': output,
+        'trials': log,
+    }
+    with open(log_output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    return report
+
+
+if __name__ == "__main__":
+    import argparse
+
+    arg_parser = argparse.ArgumentParser(description="XGBoost hyperparameter search (successive halving)")
+    arg_parser.add_argument("--target", choices=["sale", "rent"], default="sale")
+    arg_parser.add_argument("--trials", type=int, default=81, help="Configurations in the first rung")
+    arg_parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    arg_parser.add_argument("--seed", type=int, default=training.SEED)
+    arg_parser.add_argument("--output", help="Tuned model (default models/xgb_model[_rent]_tuned.json)")
+    arg_parser.add_argument("--log", help="Search log (default models/xgb_search_<target>.json)")
+    args = arg_parser.parse_args()
+
+    report = tune(args.target, args.trials, args.workers, args.seed, args.output, args.log)
+    print(f"✓ Search took {report['search_seconds']:.1f} s, best validation RMSE {report['validation_rmse']:.4f}")
+    print(f"✓ Test metrics: " + ", ".join(f"{name} {value:.4g}" for name, value in report['test_metrics'].items()))
+    print(f"✓ Best parameters: {report['best_params']}")
+    print(f"✓ Model saved to {report['model']}")